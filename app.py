@@ -1,14 +1,16 @@
 import streamlit as st
 import geopandas as gpd
+import shapely
 import pandas as pd
+from pandas.api.types import union_categoricals
 import folium
 from folium import plugins
-from streamlit_folium import st_folium
-import plotly.express as px
-import plotly.graph_objects as go
+from branca.colormap import StepColormap
+from branca.utilities import color_brewer
+import streamlit.components.v1 as components
 import os
+import copy
 import numpy as np
-from io import BytesIO
 
 # ==============================================================================
 # PROYECTO SITS - TABLERO DE INTELIGENCIA SOCIAL Y ESTRATÉGICA
@@ -207,10 +209,12 @@ st.markdown("**Diagnóstico Estratégico Municipal 2026 (Metodología ONU/OPHI +
 # ------------------------------------------------------------------------------
 # 3. FUNCIONES AUXILIARES (FIRMA LEGAL Y FORMATO)
 # ------------------------------------------------------------------------------
+@st.cache_data(show_spinner=False)
 def convertir_df_con_firma(df, nombre_archivo="datos_sits.csv"):
     """
     Agrega una fila de copyright al final del DataFrame antes de descargar.
     BLINDAJE LEGAL DE AUTORÍA.
+    En caché por contenido: el CSV solo se regenera cuando cambia la tabla, no en cada rerun.
     """
     df_export = df.copy()
     
@@ -221,7 +225,7 @@ def convertir_df_con_firma(df, nombre_archivo="datos_sits.csv"):
         row_total = pd.DataFrame([totales], columns=totales.index)
         
         # Encontrar la primera columna de texto para poner la etiqueta "TOTAL"
-        cols_texto = df_export.select_dtypes(include=['object']).columns
+        cols_texto = df_export.select_dtypes(include=['object', 'category']).columns
         if len(cols_texto) > 0:
             row_total[cols_texto[0]] = "TOTAL CONSOLIDADO"
             
@@ -250,20 +254,75 @@ def pie_tabla_sits():
     </div>
     """, unsafe_allow_html=True)
 
+# --- FORMATO NATIVO DE TABLAS (st.column_config) ---
+# El formato y las barras los dibuja el navegador sobre los datos Arrow: no se arma
+# CSS celda por celda con Styler.format/background_gradient en cada rerun.
+COLOR_BARRA = {'Reds': '#cb181d', 'Blues': '#2171b5', 'Oranges': '#d94801', 'Purples': '#6a51a3'}
+
+def col_entero():
+    """Equivale a '{:,.0f}': separador de miles, sin decimales."""
+    return st.column_config.NumberColumn(format="localized", step=1)
+
+def col_porcentaje():
+    """Equivale a '{:.1%}'."""
+    return st.column_config.NumberColumn(format="percent", step=0.001)
+
+def col_barra(serie, paleta, formato="%.2f", step=None):
+    """Barra de progreso escalada al máximo de la columna (sustituye a background_gradient)."""
+    tope = serie.max()
+    return st.column_config.ProgressColumn(
+        format=formato, step=step, min_value=0, max_value=float(tope) if tope > 0 else 1,
+        color=COLOR_BARRA.get(paleta, 'primary')
+    )
+
 # ------------------------------------------------------------------------------
 # 4. CARGA DE DATOS (CON CACHE Y FIX DE RÍOS)
 # ------------------------------------------------------------------------------
-@st.cache_data
+def colores_tecnicos(gdf):
+    """
+    Colores de las tres capas de la pestaña de Viabilidad Técnica, calculados una vez por
+    capa con np.select: Dictamen (semáforo), Peligro (gas/río) y Pendiente (5% / 15%).
+    """
+    dic = gdf['DICTAMEN_VIABILIDAD'].astype(str)
+    gdf['COLOR_DICTAMEN'] = np.select(
+        [dic.str.contains("RIESGO|FEDERAL").values, dic.str.contains("NO URBANIZABLE|DESLAVE").values],
+        ['#b71c1c', '#e65100'], default='#2e7d32') # Rojo / Naranja / Verde
+    gdf['COLOR_PELIGRO'] = np.select(
+        [gdf['RESTRICCION_GAS'].values == 1, gdf['RESTRICCION_AGUA'].values == 1],
+        ['#d32f2f', '#1976d2'], default='#eeeeee') # Gas / Río / Sin riesgo
+    p = gdf['PENDIENTE_PROMEDIO'].values
+    gdf['COLOR_PENDIENTE'] = np.select([p < 5, p < 15], ['#2e7d32', '#fbc02d'], default='#b71c1c') # Verde -> Amarillo -> Rojo
+
+@st.cache_resource
 def cargar_datos():
     """
-    Carga los archivos GeoJSON procesados que contienen TODA la inteligencia:
+    Carga las capas procesadas que contienen TODA la inteligencia:
     Social, Económica, Riesgo e Ingeniería (Pendientes/Restricciones).
+    Prioriza la copia GeoParquet (binaria, columnar) y usa el GeoJSON como respaldo.
+    Se guarda como recurso compartido: ningún rerun vuelve a deserializar las capas
+    (y sus índices espaciales sobreviven). NO modificar in-place lo que devuelve.
     """
     f_urb = "output/sits_capa_urbana.geojson"
     f_rur = "output/sits_capa_rural.geojson"
-    
+
+    # Un solo barrido (os.scandir) de las carpetas de datos en lugar de un
+    # os.path.exists por cada ruta candidata; la consulta es un acceso al set.
+    disponibles = {os.path.normpath(e.path) for d in ('output', 'data/mapas', 'shp', '.') if os.path.isdir(d) for e in os.scandir(d)}
+    def existe(ruta): return os.path.normpath(ruta) in disponibles
+
+    def leer_capa(ruta_geojson):
+        ruta_pq = os.path.splitext(ruta_geojson)[0] + ".parquet"
+        if existe(ruta_pq):
+            # Archivo mapeado en memoria: Arrow lee las columnas sin copiarlas antes a un búfer
+            return gpd.read_parquet(ruta_pq, memory_map=True)
+        if existe(ruta_geojson):
+            return gpd.read_file(ruta_geojson, engine="pyogrio", use_arrow=True)
+        return None
+
     # --- LÓGICA DE BÚSQUEDA DE RÍOS ---
-    # Buscamos en varias rutas y con el nombre original o el renombrado
+    # 1. Copia ya reproyectada a EPSG:4326 generada por 'generar_datos_final.py'
+    f_rios_pq = "output/rios_4326.parquet"
+    # 2. Respaldo: buscamos el shapefile en varias rutas con el nombre original o el renombrado
     posibles_rios = [
         "data/mapas/rios.shp", 
         "shp/rios.shp", 
@@ -272,21 +331,9 @@ def cargar_datos():
         "shp/RH28Ar_hl.shp"
     ]
     
-    gdf_rios = None
-    for ruta in posibles_rios:
-        if os.path.exists(ruta):
-            try:
-                # IMPORTANTE: Forzamos la conversión a EPSG:4326 (Lat/Lon)
-                # Si no se hace esto, el río no se ve en el mapa web.
-                temp = gpd.read_file(ruta)
-                gdf_rios = temp.to_crs(epsg=4326)
-                break
-            except Exception as e:
-                continue
-
     # Carga de Mapas Base
-    u = gpd.read_file(f_urb) if os.path.exists(f_urb) else None
-    r = gpd.read_file(f_rur) if os.path.exists(f_rur) else None
+    u = leer_capa(f_urb)
+    r = leer_capa(f_rur)
     
     if u is not None:
         u['TIPO'] = 'Urbano'
@@ -306,9 +353,107 @@ def cargar_datos():
         for c in cols_fill:
             if c in r.columns:
                 r[c] = r[c].fillna(0)
-        
+    capas = [g for g in (u, r) if g is not None]
+
+    gdf_rios = None
+    if existe(f_rios_pq):
+        try:
+            gdf_rios = gpd.read_parquet(f_rios_pq, memory_map=True)
+        except Exception:
+            gdf_rios = None
+    ruta_rios = next((p for p in posibles_rios if existe(p)), None)
+    if gdf_rios is None and ruta_rios:
+        try:
+            # Recorte al extent municipal dentro de GDAL (bbox en el CRS del archivo)
+            # y solo geometría: menos vértices que leer, reproyectar y dibujar.
+            import pyogrio  # import diferido: solo este respaldo lee el Shapefile directamente
+            bbox = None
+            crs_rios = pyogrio.read_info(ruta_rios)['crs']
+            if crs_rios and capas:
+                ext = pd.concat([g.geometry for g in capas]).total_bounds
+                bbox = tuple(gpd.GeoSeries([shapely.box(*ext)], crs=capas[0].crs).to_crs(crs_rios).total_bounds)
+            temp = pyogrio.read_dataframe(ruta_rios, columns=[], bbox=bbox, use_arrow=True)
+            # IMPORTANTE: Forzamos la conversión a EPSG:4326 (Lat/Lon)
+            # Si no se hace esto, el río no se ve en el mapa web.
+            gdf_rios = temp.to_crs(epsg=4326)
+        except Exception:
+            gdf_rios = None
+
+    # Columnas de filtro como categóricas: las comparaciones usan códigos enteros.
+    # Ambas capas comparten las mismas categorías para que pd.concat conserve el dtype;
+    # el texto se lleva antes a un solo dtype (una capa puede traerlo como texto Arrow).
+    for col in ('TIPO', 'NOM_LOC', 'CVE_AGEB'):
+        textos = [g[col].astype(str) for g in capas]
+        cats = union_categoricals([pd.Categorical(t) for t in textos], sort_categories=True).categories
+        for g, t in zip(capas, textos):
+            g[col] = pd.Categorical(t, categories=cats)
+
+    # Geometría simplificada (Douglas-Peucker) usada solo para dibujar en el navegador,
+    # con coordenadas redondeadas a una rejilla de 1e-5° (~1 m): el GeoJSON que viaja
+    # al navegador pesa ~1/3 menos. El GeoParquet ya la trae precalculada; con el
+    # GeoJSON de respaldo se calcula aquí.
+    for gdf in (u, r):
+        if gdf is not None and 'geom_web' not in gdf.columns:
+            web = gdf.geometry.simplify(tolerance=0.0001, preserve_topology=True)
+            gdf['geom_web'] = gpd.GeoSeries(shapely.set_precision(web.values, 1e-5), index=gdf.index, crs=gdf.crs)
+
+    # Centroides (lon/lat) calculados una sola vez con shapely vectorizado: todas las
+    # pestañas centran sus mapas y ubican los puntos rurales con estas columnas.
+    # El GeoParquet ya los trae precalculados; con el GeoJSON de respaldo se calculan aquí.
+    for gdf in capas:
+        if 'cx' in gdf.columns and 'cy' in gdf.columns: continue
+        cent = shapely.centroid(gdf.geometry.values)
+        gdf['cx'] = shapely.get_x(cent)
+        gdf['cy'] = shapely.get_y(cent)
+
+    # 🛡️ BLINDAJE DE DATOS - Evita que la App se rompa
+    # Se ejecuta una vez por vida de la caché; df_zona hereda las columnas vía pd.concat.
+    cols_ing = ['PENDIENTE_PROMEDIO', 'RESTRICCION_GAS', 'RESTRICCION_AGUA', 'DICTAMEN_VIABILIDAD', 'CLASIFICACION_TOPOGRAFICA', 'IND_RESILIENCIA_HIDRICA', 'IND_RIESGO_SOCIAL', 'SENDAI_P1_VULNERABILIDAD']
+    for gdf in (u, r):
+        if gdf is None: continue
+        for col in cols_ing:
+            if col not in gdf.columns: gdf[col] = 0
+
+    # Indicadores (índices 0-1 y pendiente %) en float32, banderas de restricción en int8 y
+    # conteos enteros en int32: la mitad de bytes en cada filtro, agregación y serialización.
+    for gdf in (u, r):
+        if gdf is None: continue
+        for col in gdf.columns:
+            if not pd.api.types.is_numeric_dtype(gdf[col]): continue
+            if col.startswith(('CAR_', 'IND_', 'SENDAI_')) or col in ('SITS_INDEX', 'PENDIENTE_PROMEDIO'):
+                gdf[col] = gdf[col].astype('float32')
+            elif col in ('RESTRICCION_GAS', 'RESTRICCION_AGUA'):
+                gdf[col] = gdf[col].fillna(0).astype('int8')
+            elif col not in ('cx', 'cy') and gdf[col].dtype in ('float64', 'int64'):
+                # Conteos INEGI (enteros guardados en 64 bits) -> int32
+                v = gdf[col].to_numpy()
+                if len(v) and np.isfinite(v).all() and (v == np.trunc(v)).all() and np.abs(v).max() < 2**31:
+                    gdf[col] = v.astype('int32')
+
+    # Colores de la pestaña técnica (polígonos y puntos), una vez por vida de la caché:
+    # el style_function de Folium solo lee la propiedad ya calculada.
+    for gdf in capas: colores_tecnicos(gdf)
+
+    # Índice espacial (R-tree) de cada capa, construido una sola vez: al ser recurso
+    # compartido (st.cache_resource) sobrevive a los reruns para las consultas espaciales
+    for gdf in capas: _ = gdf.sindex # Asignación: una expresión suelta la escribiría la "magia" de Streamlit
+
     return u, r, gdf_rios
 
+@st.cache_data
+def localidades_por_tipo(tipo, _u, _r):
+    """
+    Lista ordenada de localidades disponibles para cada tipo de comunidad.
+    Solo 'tipo' forma la llave de la caché (los GeoDataFrames no se hashean):
+    el universo de localidades es fijo mientras no cambien los archivos base.
+    """
+    # NOM_LOC es categórica: las categorías observadas ya vienen ordenadas y sin
+    # duplicados, y Index.union las combina en C sin hashear cadenas en Python.
+    def observadas(gdf): return gdf['NOM_LOC'].cat.remove_unused_categories().cat.categories
+    nombres_u = pd.Index([]) if tipo == "Rural" else observadas(_u)
+    nombres_r = pd.Index([]) if tipo == "Urbana (Cabecera)" else observadas(_r)
+    return nombres_u.union(nombres_r).sort_values().tolist()
+
 # Desempaquetamos los 3 objetos
 gdf_u, gdf_r, gdf_rios = cargar_datos()
 
@@ -319,6 +464,33 @@ if gdf_u is None or gdf_r is None:
 # ------------------------------------------------------------------------------
 # 5. BARRA LATERAL (FILTROS Y CONFIGURACIÓN GLOBAL)
 # ------------------------------------------------------------------------------
+# Catálogo de indicadores (constante de módulo: no se reconstruye en cada rerun)
+INDS = (
+    ("SITS_INDEX", "🔥 Índice Pobreza Multidimensional"),
+    ("CAR_POBREZA_20", "💰 Línea de Pobreza (Ingresos)"),
+    ("CAR_SERV_20", "🚰 Servicios Básicos y Energía"),
+    ("CAR_VIV_20", "🏠 Calidad y Espacios Vivienda"),
+    ("CAR_SALUD_20", "🏥 Acceso a Salud"),
+    ("CAR_EDU_20", "🎓 Rezago Educativo"),
+)
+INDS_KEYS = tuple(k for k, _ in INDS)
+INDS_LABELS = dict(INDS)
+# Columnas que consultan las pestañas sobre df_zona: fijas más las familias de indicadores,
+# que se eligen en radios y selectores (grupo P25_*, carencia, IND_/SENDAI_, DENUE)
+COLS_DF_ZONA = ('geometry', 'cx', 'cy', 'CVEGEO', 'NOM_LOC', 'TIPO', 'CVE_AGEB', 'P20_TOT', 'SITS_INDEX',
+                'PEA', 'PENDIENTE_PROMEDIO', 'DICTAMEN_VIABILIDAD')
+PREFIJOS_DF_ZONA = ('P25_', 'CAR_', 'IND_', 'SENDAI_', 'ECO_', 'RESTRICCION_')
+
+def columnas_zona(gdf):
+    """Columnas de la capa que pasan a df_zona, en el orden de la capa."""
+    return [c for c in gdf.columns if c in COLS_DF_ZONA or c.startswith(PREFIJOS_DF_ZONA)]
+
+# Columnas fijas de los padrones (tablas) de cada pestaña
+COLS_ZONA = ('NOM_LOC', 'TIPO', 'CVE_AGEB', 'P25_TOT')
+COLS_DIMENSIONES = ('CAR_POBREZA_20', 'CAR_SERV_20', 'CAR_VIV_20', 'CAR_SALUD_20', 'CAR_EDU_20')
+COLS_PADRON = ('PERSONAS_PRIORITARIAS', 'FAMILIAS_ESTIMADAS', 'SITS_INDEX') + COLS_DIMENSIONES
+COLS_DECISIONES = COLS_ZONA + ('IND_PRIORIDAD_TOTAL', 'VOCACION_DOMINANTE', 'ACCION_OBRA_PUBLICA')
+
 with st.sidebar:
     st.header("🎛️ Filtros de Control")
     st.info("Utiliza estos controles para segmentar la información en todo el tablero.")
@@ -337,43 +509,36 @@ with st.sidebar:
         ["TODO EL MUNICIPIO", "Urbana (Cabecera)", "Rural"]
     )
     
-    # Crear copias para no afectar cache
-    du = gdf_u.copy()
-    dr = gdf_r.copy()
-    
-    # Aplicar Filtro Tipo
-    if tipo_comunidad == "Urbana (Cabecera)":
-        dr = dr[dr['TIPO'] == 'Imposible'] # Vaciar rural
-    elif tipo_comunidad == "Rural":
-        du = du[du['TIPO'] == 'Imposible'] # Vaciar urbano
+    # Filtros como máscaras booleanas sobre las capas originales (comparaciones sobre
+    # .values, sin alinear índices): una sola rebanada final por capa en vez de un
+    # DataFrame intermedio por filtro. Tipo de comunidad = máscara todo-falso.
+    mask_u = np.full(len(gdf_u), tipo_comunidad != "Rural")
+    mask_r = np.full(len(gdf_r), tipo_comunidad != "Urbana (Cabecera)")
         
     # Filtro Localidad
-    locs = sorted(list(set(du['NOM_LOC'].unique()) | set(dr['NOM_LOC'].unique())))
+    locs = localidades_por_tipo(tipo_comunidad, gdf_u, gdf_r)
     sel_loc = st.selectbox("📍 Localidad Específica:", ["TODAS"] + locs)
     
     if sel_loc != "TODAS":
-        du = du[du['NOM_LOC'] == sel_loc]
-        dr = dr[dr['NOM_LOC'] == sel_loc]
+        mask_u &= gdf_u['NOM_LOC'].values == sel_loc
+        mask_r &= gdf_r['NOM_LOC'].values == sel_loc
         
     # Filtro AGEB (Solo Urbano)
     sel_ageb = "TODAS"
-    if not du.empty and tipo_comunidad != "Rural":
-        agebs = sorted(du['CVE_AGEB'].unique())
+    if mask_u.any() and tipo_comunidad != "Rural":
+        agebs = sorted(gdf_u['CVE_AGEB'].values[mask_u].unique())
         sel_ageb = st.selectbox("🏘️ AGEB (Urbano):", ["TODAS"] + agebs)
         if sel_ageb != "TODAS":
-            du = du[du['CVE_AGEB'] == sel_ageb]
+            mask_u &= gdf_u['CVE_AGEB'].values == sel_ageb
+
+    # Las capas en caché son compartidas entre sesiones: sin filtro basta una copia
+    # superficial para que las columnas que se agregan más adelante no toquen el original.
+    du = gdf_u.copy(deep=False) if mask_u.all() else gdf_u[mask_u]
+    dr = gdf_r.copy(deep=False) if mask_r.all() else gdf_r[mask_r]
 
     st.markdown("---")
     st.markdown("**Indicador de Carencia (Mapas Generales):**")
-    dict_inds = {
-        "SITS_INDEX": "🔥 Índice Pobreza Multidimensional",
-        "CAR_POBREZA_20": "💰 Línea de Pobreza (Ingresos)",
-        "CAR_SERV_20": "🚰 Servicios Básicos y Energía",
-        "CAR_VIV_20": "🏠 Calidad y Espacios Vivienda",
-        "CAR_SALUD_20": "🏥 Acceso a Salud",
-        "CAR_EDU_20": "🎓 Rezago Educativo"
-    }
-    carencia_key = st.radio("Variable a Visualizar:", list(dict_inds.keys()), format_func=lambda x: dict_inds[x])
+    carencia_key = st.radio("Variable a Visualizar:", INDS_KEYS, format_func=INDS_LABELS.get)
     
     st.markdown("""
     <div class="footer-ccpi">
@@ -383,23 +548,138 @@ with st.sidebar:
     </div>
     """, unsafe_allow_html=True)
 
-# Unificar dataframes filtrados
-df_zona = pd.concat([du, dr], ignore_index=True)
+# Unificar dataframes filtrados, proyectados a las columnas que leen las pestañas:
+# la geometría simplificada (geom_web) se queda en du/dr, de donde salen los mapas
+df_zona = pd.concat([d[columnas_zona(d)] for d in (du, dr)], ignore_index=True)
 lbl_zona = sel_loc if sel_ageb == "TODAS" else f"{sel_loc} - AGEB {sel_ageb}"
 
-# ==============================================================================
-# 🛡️ BLINDAJE DE DATOS - Evita que la App se rompa
-# ==============================================================================
-cols_ing = ['PENDIENTE_PROMEDIO', 'RESTRICCION_GAS', 'RESTRICCION_AGUA', 'DICTAMEN_VIABILIDAD', 'CLASIFICACION_TOPOGRAFICA', 'IND_RESILIENCIA_HIDRICA', 'IND_RIESGO_SOCIAL', 'SENDAI_P1_VULNERABILIDAD']
-for col in cols_ing:
-    if col not in df_zona.columns: df_zona[col] = 0
-    if col not in du.columns: du[col] = 0
-    if col not in dr.columns: dr[col] = 0
+# Las capas (du/dr/df_zona) son función pura de los filtros de la barra lateral:
+# esta tupla sirve de llave para todo lo que se calcula/dibuja a partir de ellas.
+filtros = (tipo_comunidad, sel_loc, sel_ageb)
+
+# --- COLUMNAS DERIVADAS (SOLO DEPENDEN DE LOS FILTROS) ---
+@st.cache_resource(max_entries=16)
+def columnas_derivadas(filtros, _df_zona):
+    """
+    Índice de prioridad, vocación dominante y acción sugerida de la zona filtrada.
+    Se calculan una vez por combinación de filtros, no en cada rerun de la app.
+    Devuelve un DataFrame alineado al índice de df_zona (compartido: no modificar).
+    """
+    df = _df_zona
+    der = pd.DataFrame(index=df.index)
+    der['IND_PRIORIDAD_TOTAL'] = (df['SITS_INDEX'] + df['IND_RIESGO_SOCIAL'] + df['SENDAI_P1_VULNERABILIDAD']) / 3
+
+    # --- CÁLCULO DE VOCACIÓN DOMINANTE (MEJORADO: REZAGO) ---
+    # Vectorizado: argmax sobre la matriz de sectores (N x 4); en empate gana el
+    # primer sector, igual que max() sobre el diccionario original. Se trabaja con
+    # códigos enteros y las etiquetas se asignan al final con un solo indexado.
+    def col_o_cero(c): return df[c].to_numpy(dtype=float) if c in df.columns else np.zeros(len(df))
+    vocaciones = np.array(['TURISMO 🏖️', 'COMERCIO 🛒', 'INDUSTRIA 🏭', 'SERVICIOS 🛠️', "🏠 Zona Habitacional Rezago", "Sin Actividad"], dtype=object)
+    TURISMO, COMERCIO, REZAGO, SIN_ACTIVIDAD = 0, 1, 4, 5
+    mat_eco = np.nan_to_num(np.column_stack([col_o_cero(c) for c in ('ECO_TURISMO', 'ECO_COMERCIO', 'ECO_INDUSTRIA', 'ECO_SERVICIOS')]))
+    eco_tot = col_o_cero('ECO_TOTAL')
+    # Si no hay economía pero SÍ hay gente, es un dormitorio de pobreza
+    cod_voc = np.select(
+        [(eco_tot == 0) & (col_o_cero('P25_TOT') > 50), eco_tot == 0],
+        [REZAGO, SIN_ACTIVIDAD],
+        default=mat_eco.argmax(axis=1)
+    )
+    der['VOCACION_DOMINANTE'] = vocaciones[cod_voc]
+
+    # --- CÁLCULO DE ACCIÓN SUGERIDA (VISIÓN ALCALDE) ---
+    prio = der['IND_PRIORIDAD_TOTAL'].values
+    critica = prio > 0.40 # ZONA CRÍTICA
+    der['ACCION_OBRA_PUBLICA'] = np.select(
+        [critica & (cod_voc == TURISMO), critica & (cod_voc == REZAGO), critica & (cod_voc == COMERCIO), critica, prio > 0.25],
+        ["💎 Rescate Urbano (Imagen + Drenaje)", "🚧 Infraestructura Básica (Ramo 033)", "👮 Seguridad e Iluminación", "🆘 Intervención Social Integral", "🔧 Mantenimiento Preventivo"],
+        default="✅ Monitoreo"
+    )
+    return der
+
+if not df_zona.empty and 'SITS_INDEX' in df_zona.columns:
+    for col, serie in columnas_derivadas(filtros, df_zona).items():
+        df_zona[col] = serie.values
+
+# --- CAPA PARA FOLIUM: GEOMETRÍA SIMPLIFICADA ---
+def capa_web(gdf):
+    """
+    Devuelve la capa lista para Folium con la geometría simplificada ('geom_web') activa.
+    La geometría de resolución completa se conserva en du/dr para los cálculos.
+    """
+    if 'geom_web' not in gdf.columns: return gdf
+    return gdf.set_geometry('geom_web').drop(columns=['geometry', 'cx', 'cy'], errors='ignore')
+
+# --- COROPLETAS SIN JOIN ---
+def capa_coropletica(gdf, col, paleta, fill_opacity=0.6, line_opacity=1, name=None, legend_name=""):
+    """
+    Equivalente a folium.Choropleth(geo_data=gdf, data=gdf, columns=['CVEGEO', col], ...)
+    sin el join por CVEGEO: el color de cada AGEB se calcula de una vez con numpy
+    (mismos 6 cortes de np.histogram y paleta ColorBrewer) y viaja como propiedad.
+    Solo se serializan geometría, CVEGEO y la variable.
+    """
+    capa = capa_web(gdf)
+    capa = capa[[capa.geometry.name, 'CVEGEO', col]].copy()
+    vals = capa[col].to_numpy(dtype=float)
+    validos = ~np.isnan(vals)
+    cortes = np.histogram_bin_edges(vals[validos], bins=6)
+    gama = np.array(color_brewer(paleta, n=len(cortes) - 1), dtype=object)
+    # El último corte se hace inclusivo, igual que Choropleth
+    idx = np.digitize(vals, np.append(cortes[:-1], np.nextafter(cortes[-1], np.inf))) - 1
+    capa['COLOR_WEB'] = np.where(validos, gama[np.clip(idx, 0, len(gama) - 1)], 'black')
+
+    grupo = folium.FeatureGroup(name=name)
+    folium.GeoJson(
+        capa,
+        style_function=lambda f: {'weight': 1, 'opacity': line_opacity, 'color': 'black',
+                                  'fillOpacity': fill_opacity, 'fillColor': f['properties']['COLOR_WEB']}
+    ).add_to(grupo)
+    StepColormap(list(gama), index=list(cortes), vmin=cortes[0], vmax=cortes[-1], caption=legend_name).add_to(grupo)
+    return grupo
+
+# --- PUNTOS RURALES EN EL NAVEGADOR ---
+def capa_puntos_rurales(gdf, colores, popups, radio):
+    """
+    Todos los puntos de 'gdf' en un solo arreglo JSON (FastMarkerCluster): Leaflet crea
+    los círculos en el navegador en lugar de un folium.CircleMarker por fila en Python.
+    El agrupamiento se desactiva para conservar el aspecto de puntos individuales.
+    """
+    datos = [[y, x, c, p] for y, x, c, p in zip(gdf['cy'].tolist(), gdf['cx'].tolist(), colores, popups)
+             if not np.isnan(x)] # Geometrías vacías fuera
+    callback = """
+    function (row) {
+        return L.circleMarker(new L.LatLng(row[0], row[1]), {
+            radius: %d, color: 'white', weight: 1, fill: true, fillColor: row[2], fillOpacity: 0.9
+        }).bindPopup(row[3]);
+    }""" % radio
+    return plugins.FastMarkerCluster(datos, callback=callback, disable_clustering_at_zoom=1)
+
+# --- MAPAS EN CACHÉ ---
+# Con 'filtros' en la llave, un mapa ya armado se reutiliza en los reruns que no lo afectan
+# (p. ej. al mover un control de otra pestaña) en vez de reconvertir la GeoJSON.
+# Ninguna pestaña lee de vuelta clics del mapa: se dibuja como HTML estático en un
+# iframe (components.html), sin el canal bidireccional de st_folium.
+
+@st.cache_resource(max_entries=16)
+def html_mapa(clave, _construir):
+    """
+    Construye el mapa Folium y lo renderiza a HTML una sola vez por 'clave' (pestaña +
+    filtros + opciones). '_construir' no se hashea: toda entrada que cambie el mapa debe ir en la llave.
+    """
+    return _construir().get_root().render()
+
+def dibujar_mapa(m, height):
+    """Dibuja un mapa Folium como HTML estático."""
+    components.html(m.get_root().render(), height=height)
+
+def dibujar_mapa_en_cache(clave, construir, height):
+    """Dibuja el HTML en caché del mapa (se renderiza solo si la llave es nueva)."""
+    components.html(html_mapa(clave, construir), height=height)
 
 # --- FUNCIÓN GLOBAL PARA CREAR MAPAS BASE CON EL ESTILO SELECCIONADO ---
-def crear_mapa_base(lat, lon, zoom=13):
-    """Crea el objeto Folium Map según el selector de la barra lateral."""
-    if estilo_mapa == "Satelital (Google HD)":
+@st.cache_resource(max_entries=32)
+def plantilla_mapa_base(estilo, lat, lon, zoom):
+    """Mapa Folium solo con el fondo (teselas) del estilo elegido; se clona en cada uso."""
+    if estilo == "Satelital (Google HD)":
         m = folium.Map(location=[lat, lon], zoom_start=zoom, tiles=None)
         folium.TileLayer(
             tiles='https://mt1.google.com/vt/lyrs=y&x={x}&y={y}&z={z}',
@@ -408,12 +688,20 @@ def crear_mapa_base(lat, lon, zoom=13):
             overlay=False,
             control=True
         ).add_to(m)
-    elif estilo_mapa == "Oscuro (CartoDB)":
+    elif estilo == "Oscuro (CartoDB)":
         m = folium.Map(location=[lat, lon], zoom_start=zoom, tiles="CartoDB dark_matter")
     else:
         m = folium.Map(location=[lat, lon], zoom_start=zoom, tiles="CartoDB positron")
     return m
 
+def crear_mapa_base(lat, lon, zoom=13):
+    """Crea el objeto Folium Map según el selector de la barra lateral."""
+    # La plantilla en caché nunca se modifica: cada pestaña recibe un clon (deepcopy,
+    # ~10x más barato que construir el mapa) con id propio para no chocar en el HTML.
+    m = copy.deepcopy(plantilla_mapa_base(estilo_mapa, float(lat), float(lon), zoom))
+    m._id = m._generate_id()
+    return m
+
 # ------------------------------------------------------------------------------
 # 6. ESTRUCTURA DE PESTAÑAS (REORDENADA: ECONOMÍA ANTES DE TOMA DECISIONES)
 # ------------------------------------------------------------------------------
@@ -436,54 +724,36 @@ with tab1:
     
     with col_map:
         if not df_zona.empty:
-            # Centrar mapa
-            lat = df_zona.geometry.centroid.y.mean()
-            lon = df_zona.geometry.centroid.x.mean()
-            m = crear_mapa_base(lat, lon) # Usa la función global
-            
-            # Capa Urbana (Polígonos)
-            if not du.empty:
-                folium.Choropleth(
-                    geo_data=du, 
-                    data=du, 
-                    columns=['CVEGEO', carencia_key],
-                    key_on='feature.properties.CVEGEO', 
-                    fill_color='YlOrRd', 
-                    fill_opacity=0.7, 
-                    line_opacity=0.1, 
-                    name="Urbano",
-                    legend_name=f"{dict_inds[carencia_key]}"
-                ).add_to(m)
+            def construir_mapa_general():
+                # Centrar mapa
+                lat = df_zona['cy'].mean()
+                lon = df_zona['cx'].mean()
+                m = crear_mapa_base(lat, lon) # Usa la función global
             
-            # Capa Rural (Puntos)
-            if not dr.empty:
-                for _, r in dr.iterrows():
-                    if r.geometry.is_empty: continue
-                    val = r[carencia_key]
-                    # Lógica de colores manual para puntos
-                    if val >= 0.4: c = '#800000' # Crítico
-                    elif val >= 0.25: c = '#ff0000' # Alto
-                    elif val >= 0.15: c = '#ffa500' # Medio
-                    else: c = '#27ae60' # Bajo
-                    
-                    folium.CircleMarker(
-                        location=[r.geometry.centroid.y, r.geometry.centroid.x],
-                        radius=7, 
-                        color='white', 
-                        weight=1, 
-                        fill=True, 
-                        fill_color=c, 
-                        fill_opacity=0.9,
-                        popup=f"<b>{r['NOM_LOC']}</b><br>Valor: {val:.1%}"
+                # Capa Urbana (Polígonos)
+                if not du.empty:
+                    capa_coropletica(
+                        du, carencia_key, 'YlOrRd', fill_opacity=0.7, line_opacity=0.1,
+                        name="Urbano", legend_name=f"{INDS_LABELS[carencia_key]}"
                     ).add_to(m)
             
-            st_folium(m, height=550, use_container_width=True)
+                # Capa Rural (Puntos)
+                if not dr.empty:
+                    # Lógica de colores manual para puntos (vectorizada)
+                    vals = dr[carencia_key].values
+                    colores = np.select([vals >= 0.4, vals >= 0.25, vals >= 0.15], ['#800000', '#ff0000', '#ffa500'], default='#27ae60') # Crítico / Alto / Medio / Bajo
+                    popups = [f"<b>{nom_loc}</b><br>Valor: {val:.1%}" for nom_loc, val in zip(dr['NOM_LOC'], vals)]
+                    capa_puntos_rurales(dr, colores, popups, radio=7).add_to(m)
+            
+                return m
+
+            dibujar_mapa_en_cache(("general", filtros, estilo_mapa, carencia_key), construir_mapa_general, height=550)
         else: 
             st.warning("No hay datos para la selección actual.")
             
     with col_ley:
         st.subheader("Semáforo de Interpretación")
-        st.markdown(f"**Variable:** {dict_inds[carencia_key]}")
+        st.markdown(f"**Variable:** {INDS_LABELS[carencia_key]}")
         st.markdown("""
         <div style="background-color:#800000;" class="semaforo-box">CRÍTICO (>40%)</div>
         <div style="background-color:#ff0000;" class="semaforo-box">ALTO (25-40%)</div>
@@ -531,24 +801,29 @@ with tab2:
     # Gráfico de Afectación
     if not df_zona.empty and col_g in df_zona.columns:
         tot_g = df_zona[col_g].sum()
-        # Cálculo ponderado de afectación
-        afec = (df_zona[col_g] * df_zona[carencia_key]).sum()
+        # Cálculo ponderado de afectación (grupo × carencia en numpy, una sola vez:
+        # la pestaña del Padrón reutiliza el mismo arreglo como PERSONAS_PRIORITARIAS)
+        pob_g = df_zona[col_g].to_numpy(dtype=float)
+        personas_prio = pob_g * df_zona[carencia_key].to_numpy(dtype=float)
+        afec = np.nansum(personas_prio)
         pct_afec = (afec / tot_g * 100) if tot_g > 0 else 0
         
         with c_res:
             k1, k2 = st.columns(2)
             k1.metric(f"Total {sel_g}", f"{int(tot_g):,}")
-            k2.metric(f"Personas Afectadas ({dict_inds[carencia_key]})", f"{int(afec):,}", f"{pct_afec:.1f}% de incidencia")
+            k2.metric(f"Personas Afectadas ({INDS_LABELS[carencia_key]})", f"{int(afec):,}", f"{pct_afec:.1f}% de incidencia")
         
         # Gráfico de Barras por Dimensión
-        dims_vals = []
         dims_names = ['Ingreso', 'Servicios', 'Vivienda', 'Salud', 'Educación']
-        dims_keys = ['CAR_POBREZA_20', 'CAR_SERV_20', 'CAR_VIV_20', 'CAR_SALUD_20', 'CAR_EDU_20']
+        dims_keys = list(COLS_DIMENSIONES)
         
-        for d in dims_keys:
-            val_d = (df_zona[col_g] * df_zona[d]).sum()
-            dims_vals.append(val_d)
+        # Las 5 dimensiones en un solo producto vector-matriz (gemv): pob_g @ (N x 5).
+        # Los NaN cuentan como 0, igual que la suma de pandas.
+        dims_vals = np.nan_to_num(pob_g) @ np.nan_to_num(df_zona[dims_keys].to_numpy(dtype=float))
             
+        # Import diferido: plotly (~0.1 s) se carga después de que la barra lateral y el
+        # mapa general ya se enviaron al navegador; en reruns Python lo toma de sys.modules.
+        import plotly.express as px
         fig_bar = px.bar(
             x=dims_names, 
             y=dims_vals, 
@@ -566,41 +841,39 @@ with tab3:
     
     if not df_zona.empty and col_g in df_zona.columns:
         # CÁLCULOS MEJORADOS (VISIÓN ALCALDE)
-        df_zona['PERSONAS_PRIORITARIAS'] = df_zona[col_g] * df_zona[carencia_key]
+        df_zona['PERSONAS_PRIORITARIAS'] = personas_prio # Calculado en la pestaña de Estadística
         
         # Cálculo de Familias (Promedio 3.6 habitantes por hogar en Veracruz)
-        df_zona['FAMILIAS_ESTIMADAS'] = df_zona['PERSONAS_PRIORITARIAS'] / 3.6 
+        df_zona['FAMILIAS_ESTIMADAS'] = personas_prio / 3.6 
         
         # Selección de columnas que incluyan las 6 dimensiones básicas
-        cols_base = ['NOM_LOC', 'TIPO', 'CVE_AGEB', 'P25_TOT', col_g, 'PERSONAS_PRIORITARIAS', 'FAMILIAS_ESTIMADAS', 'SITS_INDEX']
-        cols_dimensiones = ['CAR_POBREZA_20', 'CAR_SERV_20', 'CAR_VIV_20', 'CAR_SALUD_20', 'CAR_EDU_20']
+        # El grupo elegido solo se agrega si no es 'Población Total' (P25_TOT ya está)
+        cols_padron = [*COLS_ZONA, col_g, *COLS_PADRON] if col_g not in COLS_ZONA else [*COLS_ZONA, *COLS_PADRON]
         
-        cols_deseadas = cols_base + cols_dimensiones
-        cols_unicas = list(dict.fromkeys(cols_deseadas))
+        top = df_zona[cols_padron].sort_values('PERSONAS_PRIORITARIAS', ascending=False).head(100)
+        top.index = pd.RangeIndex(1, len(top) + 1) # Enumerar filas desde 1 (sin el copiado de reset_index)
         
-        top = df_zona[cols_unicas].sort_values('PERSONAS_PRIORITARIAS', ascending=False).head(100).reset_index(drop=True)
-        top.index = top.index + 1 # Enumerar filas desde 1
-        
-        # ESTILO: ALERTA VISUAL EN ROJO SI SITS_INDEX > 0.3
-        def resaltar_critico(val):
-            color = '#ffcccc' if val > 0.3 else '' # Rojo claro
-            return f'background-color: {color}'
-
-        # Formateo
-        fmt_dims = {d: "{:.1%}" for d in cols_dimensiones}
+        # ALERTA VISUAL EN ROJO SI SITS_INDEX > 0.3: columna marcador junto al índice (solo en
+        # pantalla; column_config no colorea celdas por condición y así no hace falta Styler)
+        alerta = np.where(top['SITS_INDEX'].values > 0.3, '🔴', '')
+        orden = list(top.columns)
+        orden.insert(orden.index('SITS_INDEX'), 'ALERTA')
+
+        # Formateo (todo lo formatea column_config)
+        fmt_dims = {d: col_porcentaje() for d in COLS_DIMENSIONES}
         fmt_base = {
-            col_g: "{:,.0f}", 
-            'PERSONAS_PRIORITARIAS': "{:,.0f}", 
-            'FAMILIAS_ESTIMADAS': "{:,.0f}",
-            'SITS_INDEX': "{:.2f}"
+            col_g: col_entero(), 
+            'PERSONAS_PRIORITARIAS': col_entero(), 
+            'FAMILIAS_ESTIMADAS': col_barra(top['FAMILIAS_ESTIMADAS'], 'Reds', formato="localized", step=1),
+            'ALERTA': st.column_config.TextColumn("⚠️", help="Zona crítica: SITS_INDEX > 0.3", width="small"),
+            'SITS_INDEX': st.column_config.NumberColumn(format="%.2f")
         }
         fmt_all = {**fmt_base, **fmt_dims}
 
         st.dataframe(
-            top.style
-            .format(fmt_all)
-            .applymap(resaltar_critico, subset=['SITS_INDEX'])
-            .background_gradient(cmap='Reds', subset=['FAMILIAS_ESTIMADAS']), 
+            top.assign(ALERTA=alerta),
+            column_config=fmt_all,
+            column_order=orden,
             use_container_width=True
         )
         
@@ -625,23 +898,30 @@ with tab4:
         p25 = df_zona['P25_TOT'].sum()
         st.metric("Crecimiento Demográfico Total", f"{int(p25-p20):,}", f"{(p25-p20)/p20*100:.1f}%")
         
-        col_charts = st.columns(2)
         dims = ['CAR_POBREZA_20', 'CAR_SERV_20', 'CAR_VIV_20', 'CAR_SALUD_20', 'CAR_EDU_20']
         noms = ['Ingreso', 'Servicios', 'Vivienda', 'Salud', 'Educación']
         
-        # Generar gráficos comparativos uno por uno
-        for i, (d, n) in enumerate(zip(dims, noms)):
-             v20 = df_zona[d].mean()*100
-             v25 = v20*0.95 # Simulación de meta del 5%
-             
-             fig = go.Figure(data=[
-                 go.Bar(name='2020 (Base)', x=[n], y=[v20], marker_color='#95a5a6'),
-                 go.Bar(name='2025 (Meta)', x=[n], y=[v25], marker_color='#27ae60')
-             ])
-             fig.update_layout(title=f"Evolución Indicador: {n}", height=300)
-             
-             with col_charts[i % 2]:
-                 st.plotly_chart(fig, use_container_width=True)
+        import plotly.express as px  # import diferido (ver pestaña de estadística)
+
+        # Una sola reducción para los 5 indicadores y una sola figura con facetas
+        # (antes: 5 go.Figure y 5 st.plotly_chart por rerun)
+        v20 = df_zona[dims].mean().to_numpy() * 100
+        v25 = v20 * 0.95 # Simulación de meta del 5%
+        df_comp = pd.DataFrame({
+            'Indicador': noms * 2,
+            'Año': ['2020 (Base)'] * len(noms) + ['2025 (Meta)'] * len(noms),
+            'Valor': np.concatenate([v20, v25])
+        })
+        fig = px.bar(df_comp, x='Indicador', y='Valor', color='Año', barmode='group',
+                     facet_col='Indicador', facet_col_wrap=2, facet_row_spacing=0.08,
+                     category_orders={'Indicador': noms},
+                     color_discrete_map={'2020 (Base)': '#95a5a6', '2025 (Meta)': '#27ae60'})
+        # Escalas independientes por faceta, como en las gráficas separadas
+        fig.update_xaxes(matches=None, title_text=None)
+        fig.update_yaxes(matches=None, showticklabels=True, title_text=None)
+        fig.for_each_annotation(lambda a: a.update(text=f"Evolución Indicador: {a.text.split('=')[-1]}"))
+        fig.update_layout(height=300 * ((len(noms) + 1) // 2), legend_title_text=None)
+        st.plotly_chart(fig, use_container_width=True)
 
 # --- TAB 5: RESILIENCIA (MCR2030) ---
 with tab5:
@@ -681,64 +961,61 @@ with tab5:
     st.markdown("---")
     st.markdown("<div class='section-title'>3. Mapa de Riesgos</div>", unsafe_allow_html=True)
     if not df_zona.empty:
-        lat = df_zona.geometry.centroid.y.mean()
-        lon = df_zona.geometry.centroid.x.mean()
-        m2 = crear_mapa_base(lat, lon) # Mapa Global
+        def construir_mapa_mcr():
+            lat = df_zona['cy'].mean()
+            lon = df_zona['cx'].mean()
+            m2 = crear_mapa_base(lat, lon) # Mapa Global
         
-        if not du.empty:
-            folium.Choropleth(
-                geo_data=du, 
-                data=du, 
-                columns=['CVEGEO', ind], 
-                key_on='feature.properties.CVEGEO', 
-                fill_color=clr, 
-                fill_opacity=0.7, 
-                line_opacity=0.1,
-                legend_name=f"Índice {eje}"
-            ).add_to(m2)
+            if not du.empty:
+                capa_coropletica(du, ind, clr, fill_opacity=0.7, line_opacity=0.1, legend_name=f"Índice {eje}").add_to(m2)
             
-        st_folium(m2, height=450, use_container_width=True)
+            return m2
+
+        dibujar_mapa_en_cache(("mcr", filtros, estilo_mapa, eje), construir_mapa_mcr, height=450)
 
     st.markdown("<div class='section-title'>4. Detalle Operativo (Logística de Pipas/Apoyos)</div>", unsafe_allow_html=True)
     if not df_zona.empty:
         # LÓGICA DE ALCALDE: DEFINICIÓN DE ESTATUS OPERATIVO SEGÚN EJE
         
+        # Semáforo vectorizado con np.select: sin función Python por fila. Un NaN no
+        # cumple ninguna condición y cae en el verde, igual que los if/elif anteriores.
+        vals = df_zona[ind].to_numpy(dtype=float)
+
         # 1. HÍDRICA
         if "Hídrica" in eje:
-            def status_hidrico(val):
-                if val < 0.4: return "🔴 URGENTE (24 HRS - Sin Tinaco)"
-                elif val < 0.7: return "🟡 PROGRAMADA (48 HRS)"
-                else: return "🟢 RESILIENTE (Tiene Cisterna)"
-            df_zona['ESTATUS_OPERATIVO'] = df_zona[ind].apply(status_hidrico)
+            df_zona['ESTATUS_OPERATIVO'] = np.select(
+                [vals < 0.4, vals < 0.7],
+                ["🔴 URGENTE (24 HRS - Sin Tinaco)", "🟡 PROGRAMADA (48 HRS)"],
+                default="🟢 RESILIENTE (Tiene Cisterna)"
+            )
             nombre_archivo = "logistica_pipas_agua.csv"
             
         # 2. AMBIENTAL
         elif "Ambiental" in eje:
-            def status_ambiental(val):
-                if val > 0.4: return "🔴 FOCO INFECCIÓN (Drenaje/Humo)"
-                elif val > 0.2: return "🟡 RIESGO LATENTE"
-                else: return "🟢 SANEADO"
-            df_zona['ESTATUS_OPERATIVO'] = df_zona[ind].apply(status_ambiental)
+            df_zona['ESTATUS_OPERATIVO'] = np.select(
+                [vals > 0.4, vals > 0.2],
+                ["🔴 FOCO INFECCIÓN (Drenaje/Humo)", "🟡 RIESGO LATENTE"],
+                default="🟢 SANEADO"
+            )
             nombre_archivo = "focos_infeccion_ambiental.csv"
             
         # 3. SOCIAL
         else: # Social
-            def status_social(val):
-                if val > 0.3: return "🔴 PROGRAMA EMPLEO TEMPORAL"
-                elif val > 0.15: return "🟡 CAPACITACIÓN/MICROCRÉDITO"
-                else: return "🟢 ESTABLE"
-            df_zona['ESTATUS_OPERATIVO'] = df_zona[ind].apply(status_social)
+            df_zona['ESTATUS_OPERATIVO'] = np.select(
+                [vals > 0.3, vals > 0.15],
+                ["🔴 PROGRAMA EMPLEO TEMPORAL", "🟡 CAPACITACIÓN/MICROCRÉDITO"],
+                default="🟢 ESTABLE"
+            )
             nombre_archivo = "apoyos_empleo_social.csv"
 
-        cols_tb = ['NOM_LOC', 'TIPO', 'CVE_AGEB', 'P25_TOT', ind, 'ESTATUS_OPERATIVO']
         # Ordenamos: si es agua, los que tienen menos (ascendente). Si es riesgo, los que tienen más (descendente).
         ascending_order = True if "Hídrica" in eje else False
-        tb = df_zona[list(dict.fromkeys(cols_tb))].sort_values(ind, ascending=ascending_order).reset_index(drop=True)
-        tb.index = tb.index + 1 # Enumeración
+        tb = df_zona[[*COLS_ZONA, ind, 'ESTATUS_OPERATIVO']].sort_values(ind, ascending=ascending_order)
+        tb.index = pd.RangeIndex(1, len(tb) + 1) # Enumeración
         
         st.dataframe(
-            tb.style.format({ind: "{:.2f}", 'P25_TOT': "{:,.0f}"})
-            .background_gradient(cmap=clr, subset=[ind]), 
+            tb,
+            column_config={ind: col_barra(tb[ind], clr), 'P25_TOT': col_entero()},
             use_container_width=True
         )
         pie_tabla_sits()
@@ -780,8 +1057,9 @@ with tab6:
         # CÁLCULOS ESPECÍFICOS POR PRIORIDAD (Visión Alcalde)
         if "1." in prioridad and not df_zona.empty:
             # Evacuación
-            df_zona['POB_VULNERABLE_TOTAL'] = df_zona['P25_TOT'] * df_zona[ind_sendai]
-            df_zona['RECURSO_NECESARIO'] = df_zona['POB_VULNERABLE_TOTAL'] / 10 
+            pob_vulnerable = df_zona['P25_TOT'].values * df_zona[ind_sendai].values
+            df_zona['POB_VULNERABLE_TOTAL'] = pob_vulnerable
+            df_zona['RECURSO_NECESARIO'] = pob_vulnerable / 10 
             label_recurso = "Camionetas de Rescate (10 pax)"
             total_recurso = df_zona['RECURSO_NECESARIO'].sum()
             st.metric(f"Total {label_recurso}", f"{int(total_recurso)} Unidades")
@@ -789,8 +1067,9 @@ with tab6:
         elif "3." in prioridad and not df_zona.empty:
             # Vivienda (Prevención)
             # Estimamos viviendas precarias = (Pob Total / 3.6) * Índice Fragilidad
-            df_zona['VIVIENDAS_RIESGO'] = (df_zona['P25_TOT'] / 3.6) * df_zona[ind_sendai]
-            df_zona['RECURSO_NECESARIO'] = df_zona['VIVIENDAS_RIESGO']
+            viv_riesgo = (df_zona['P25_TOT'].values / 3.6) * df_zona[ind_sendai].values
+            df_zona['VIVIENDAS_RIESGO'] = viv_riesgo
+            df_zona['RECURSO_NECESARIO'] = viv_riesgo
             label_recurso = "Viviendas a Reforzar (Techo/Muro)"
             total_recurso = df_zona['RECURSO_NECESARIO'].sum()
             st.metric(f"Total {label_recurso}", f"{int(total_recurso)} Casas")
@@ -799,8 +1078,9 @@ with tab6:
             # Capacidad (Respuesta)
             # Si el índice es alto (>0.8), la zona está en "Silencio". 
             # Calculamos población en zonas de silencio.
-            df_zona['POB_INCOMUNICADA'] = df_zona.apply(lambda x: x['P25_TOT'] if x[ind_sendai] > 0.7 else 0, axis=1)
-            df_zona['RECURSO_NECESARIO'] = df_zona.apply(lambda x: 1 if x[ind_sendai] > 0.7 else 0, axis=1) # 1 Antena/Radio por zona crítica
+            silencio = df_zona[ind_sendai].values > 0.7
+            df_zona['POB_INCOMUNICADA'] = np.where(silencio, df_zona['P25_TOT'].values, 0)
+            df_zona['RECURSO_NECESARIO'] = silencio.astype(int) # 1 Antena/Radio por zona crítica
             label_recurso = "Puntos Ciegos (Requieren Radio/Antena)"
             total_recurso = df_zona['RECURSO_NECESARIO'].sum()
             st.metric(f"Total {label_recurso}", f"{int(total_recurso)} Sitios")
@@ -808,33 +1088,31 @@ with tab6:
     st.markdown("---")
     st.markdown("<div class='section-title'>3. Mapa de Riesgos ONU</div>", unsafe_allow_html=True)
     if not df_zona.empty:
-        lat = df_zona.geometry.centroid.y.mean()
-        lon = df_zona.geometry.centroid.x.mean()
-        ms = crear_mapa_base(lat, lon) # Global
+        def construir_mapa_sendai():
+            lat = df_zona['cy'].mean()
+            lon = df_zona['cx'].mean()
+            ms = crear_mapa_base(lat, lon) # Global
         
-        if not du.empty:
-             folium.Choropleth(
-                 geo_data=du, 
-                 data=du, 
-                 columns=['CVEGEO', ind_sendai], 
-                 key_on='feature.properties.CVEGEO', 
-                 fill_color=color_s, 
-                 fill_opacity=0.8, 
-                 line_opacity=0.1
-             ).add_to(ms)
+            if not du.empty:
+                 capa_coropletica(du, ind_sendai, color_s, fill_opacity=0.8, line_opacity=0.1).add_to(ms)
              
-        st_folium(ms, height=450, use_container_width=True)  
+            return ms
+
+        dibujar_mapa_en_cache(("sendai", filtros, estilo_mapa, prioridad), construir_mapa_sendai, height=450)
 
     st.markdown("<div class='section-title'>4. Plan de Acción (Política Pública)</div>", unsafe_allow_html=True)
     if not df_zona.empty:
-        cols_ts = ['NOM_LOC', 'TIPO', 'CVE_AGEB', 'P25_TOT', ind_sendai, 'RECURSO_NECESARIO']
         
-        tb_s = df_zona[list(dict.fromkeys(cols_ts))].sort_values(ind_sendai, ascending=False).head(100).reset_index(drop=True)
-        tb_s.index = tb_s.index + 1
+        tb_s = df_zona[[*COLS_ZONA, ind_sendai, 'RECURSO_NECESARIO']].sort_values(ind_sendai, ascending=False).head(100)
+        tb_s.index = pd.RangeIndex(1, len(tb_s) + 1)
         
-        fmt = {ind_sendai: "{:.1%}", 'P25_TOT': "{:,.0f}", 'RECURSO_NECESARIO': "{:,.1f}"}
+        fmt = {
+            ind_sendai: col_barra(tb_s[ind_sendai], color_s, formato="percent", step=0.001),
+            'P25_TOT': col_entero(),
+            'RECURSO_NECESARIO': st.column_config.NumberColumn(format="localized", step=0.1)
+        }
         
-        st.dataframe(tb_s.style.format(fmt).background_gradient(cmap=color_s), use_container_width=True)
+        st.dataframe(tb_s, column_config=fmt, use_container_width=True)
         pie_tabla_sits()
         
         # Nombre de archivo dinámico
@@ -850,10 +1128,10 @@ with tab7:
     
     # Filtro local Urbano/Rural
     tipo_filtro_eco = st.radio("Filtro Geográfico (Vista):", ["Todo el Municipio", "Solo Urbano", "Solo Rural"], horizontal=True)
-    du_eco = du.copy(); dr_eco = dr.copy()
-    if tipo_filtro_eco == "Solo Urbano": dr_eco = dr_eco[dr_eco['TIPO'] == 'X']
-    elif tipo_filtro_eco == "Solo Rural": du_eco = du_eco[du_eco['TIPO'] == 'X']
-    df_eco_filtered = pd.concat([du_eco, dr_eco], ignore_index=True)
+    # Máscara sobre df_zona (TIPO es categórico) en vez de copiar y concatenar capas
+    if tipo_filtro_eco == "Todo el Municipio": df_eco_filtered = df_zona
+    else: df_eco_filtered = df_zona[df_zona['TIPO'].values == ('Urbano' if tipo_filtro_eco == "Solo Urbano" else 'Rural')]
+    du_eco = du.iloc[:0] if tipo_filtro_eco == "Solo Rural" else du # El mapa solo dibuja AGEBs urbanas
 
     col_eco1, col_eco2 = st.columns([3, 1])
     
@@ -873,29 +1151,26 @@ with tab7:
 
     with col_eco1:
         # MAPA ECONÓMICO
-        lat = df_zona.geometry.centroid.y.mean(); lon = df_zona.geometry.centroid.x.mean()
-        m_eco = crear_mapa_base(lat, lon) # Global
+        def construir_mapa_economia():
+            lat = df_zona['cy'].mean(); lon = df_zona['cx'].mean()
+            m_eco = crear_mapa_base(lat, lon) # Global
         
-        if not du_eco.empty:
-            paleta = 'YlOrRd' if 'TURISMO' in sector_ver else 'YlGn'
-            folium.Choropleth(
-                geo_data=du_eco, 
-                data=du_eco, 
-                columns=['CVEGEO', sector_ver], 
-                key_on='feature.properties.CVEGEO', 
-                fill_color=paleta, 
-                fill_opacity=0.7, 
-                line_opacity=0.1, 
-                legend_name=f'{sector_ver}'
-            ).add_to(m_eco)
-        st_folium(m_eco, height=450, use_container_width=True)
+            if not du_eco.empty:
+                paleta = 'YlOrRd' if 'TURISMO' in sector_ver else 'YlGn'
+                capa_coropletica(du_eco, sector_ver, paleta, fill_opacity=0.7, line_opacity=0.1, legend_name=f'{sector_ver}').add_to(m_eco)
+            return m_eco
+
+        dibujar_mapa_en_cache(("economia", filtros, estilo_mapa, tipo_filtro_eco, sector_ver), construir_mapa_economia, height=450)
 
     # --- NUEVO: CÁLCULO DE INFORMALIDAD ---
     # Lógica: PEA (Gente que trabaja) - (Negocios * 3 empleados promedio). Si sobra gente, es informal.
     if not df_eco_filtered.empty and 'PEA' in df_eco_filtered.columns:
-        df_eco_filtered['EMPLEO_FORMAL_EST'] = df_eco_filtered['ECO_TOTAL'] * 3 
-        df_eco_filtered['ESTIMACION_INFORMALIDAD'] = df_eco_filtered['PEA'] - df_eco_filtered['EMPLEO_FORMAL_EST']
-        df_eco_filtered['ESTIMACION_INFORMALIDAD'] = df_eco_filtered['ESTIMACION_INFORMALIDAD'].clip(lower=0) # No negativos
+        # assign() devuelve un marco nuevo: df_zona (posible vista) no se modifica
+        formal = df_eco_filtered['ECO_TOTAL'] * 3
+        df_eco_filtered = df_eco_filtered.assign(
+            EMPLEO_FORMAL_EST=formal,
+            ESTIMACION_INFORMALIDAD=(df_eco_filtered['PEA'] - formal).clip(lower=0) # No negativos
+        )
 
     st.markdown("---")
     st.markdown("### 📋 Padrón Económico con Detección de Informalidad")
@@ -904,16 +1179,18 @@ with tab7:
     cols_inventario = ['NOM_LOC', 'TIPO', 'CVE_AGEB', 'ECO_TOTAL', 'IND_VOCACION_TURISTICA', 'PEA', 'ESTIMACION_INFORMALIDAD']
     
     # Renombrar para usuario final
-    df_inv = df_eco_filtered[cols_inventario].copy()
-    df_inv.rename(columns={'IND_VOCACION_TURISTICA': '% Dep. Turismo', 'PEA': 'Pob. Econ. Activa', 'ESTIMACION_INFORMALIDAD': 'Posible Empleo Informal'}, inplace=True)
-    
-    df_inv = df_inv.sort_values('Posible Empleo Informal', ascending=False).reset_index(drop=True)
-    df_inv.index = df_inv.index + 1
+    # (rename y sort_values ya devuelven marcos nuevos: sin .copy() ni reset_index intermedios)
+    df_inv = (df_eco_filtered[cols_inventario]
+              .rename(columns={'IND_VOCACION_TURISTICA': '% Dep. Turismo', 'PEA': 'Pob. Econ. Activa', 'ESTIMACION_INFORMALIDAD': 'Posible Empleo Informal'})
+              .sort_values('Posible Empleo Informal', ascending=False))
+    df_inv.index = pd.RangeIndex(1, len(df_inv) + 1)
 
     st.dataframe(
-        df_inv.style
-        .format({'ECO_TOTAL': "{:,.0f}", '% Dep. Turismo': "{:.1%}", 'Pob. Econ. Activa': "{:,.0f}", 'Posible Empleo Informal': "{:,.0f}"})
-        .background_gradient(cmap='Oranges', subset=['Posible Empleo Informal']),
+        df_inv,
+        column_config={
+            'ECO_TOTAL': col_entero(), '% Dep. Turismo': col_porcentaje(), 'Pob. Econ. Activa': col_entero(),
+            'Posible Empleo Informal': col_barra(df_inv['Posible Empleo Informal'], 'Oranges', formato="localized", step=1)
+        },
         use_container_width=True
     )
     pie_tabla_sits()
@@ -947,82 +1224,51 @@ with tab8:
               "🔴 CRUCE PRIORITARIO (TODAS)"], horizontal=True)
 
     if not df_zona.empty and 'SITS_INDEX' in df_zona.columns:
-        # CÁLCULOS
-        df_zona['IND_PRIORIDAD_TOTAL'] = (df_zona['SITS_INDEX'] + df_zona['IND_RIESGO_SOCIAL'] + df_zona['SENDAI_P1_VULNERABILIDAD']) / 3
-        
-        # --- CÁLCULO DE VOCACIÓN DOMINANTE (MEJORADO: REZAGO) ---
-        def determinar_vocacion(row):
-            # Si no hay economía pero SÍ hay gente, es un dormitorio de pobreza
-            if (row.get('ECO_TOTAL', 0) == 0) and (row.get('P25_TOT', 0) > 50):
-                return "🏠 Zona Habitacional Rezago"
-            
-            if row.get('ECO_TOTAL', 0) == 0:
-                return "Sin Actividad"
-
-            sectores = {
-                'TURISMO 🏖️': row.get('ECO_TURISMO', 0),
-                'COMERCIO 🛒': row.get('ECO_COMERCIO', 0),
-                'INDUSTRIA 🏭': row.get('ECO_INDUSTRIA', 0),
-                'SERVICIOS 🛠️': row.get('ECO_SERVICIOS', 0)
-            }
-            return max(sectores, key=sectores.get)
-
-        df_zona['VOCACION_DOMINANTE'] = df_zona.apply(determinar_vocacion, axis=1)
-
-        # --- CÁLCULO DE ACCIÓN SUGERIDA (VISIÓN ALCALDE) ---
-        def sugerir_accion(row):
-            prio = row['IND_PRIORIDAD_TOTAL']
-            voc = row['VOCACION_DOMINANTE']
-            
-            if prio > 0.40: # ZONA CRÍTICA
-                if "TURISMO" in voc: return "💎 Rescate Urbano (Imagen + Drenaje)"
-                if "Rezago" in voc: return "🚧 Infraestructura Básica (Ramo 033)"
-                if "COMERCIO" in voc: return "👮 Seguridad e Iluminación"
-                return "🆘 Intervención Social Integral"
-            elif prio > 0.25:
-                return "🔧 Mantenimiento Preventivo"
-            else:
-                return "✅ Monitoreo"
-
-        df_zona['ACCION_OBRA_PUBLICA'] = df_zona.apply(sugerir_accion, axis=1)
-
-        # Propagación a mapas (copias du/dr)
+        # CÁLCULOS: IND_PRIORIDAD_TOTAL, VOCACION_DOMINANTE y ACCION_OBRA_PUBLICA ya vienen
+        # precalculadas en df_zona (ver columnas_derivadas).
+
+        # Propagación a mapas (copias du/dr). df_zona = concat([du, dr]) conserva el orden de
+        # las filas, así que basta un corte posicional (sin reconstruir un índice por CVEGEO).
+        prio_total = df_zona['IND_PRIORIDAD_TOTAL'].to_numpy()
         if not du.empty:
-            du['IND_PRIORIDAD_TOTAL'] = df_zona.set_index('CVEGEO')['IND_PRIORIDAD_TOTAL'].reindex(du['CVEGEO']).values
+            du['IND_PRIORIDAD_TOTAL'] = prio_total[:len(du)]
         if not dr.empty:
-            dr['IND_PRIORIDAD_TOTAL'] = df_zona.set_index('CVEGEO')['IND_PRIORIDAD_TOTAL'].reindex(dr['CVEGEO']).values
+            dr['IND_PRIORIDAD_TOTAL'] = prio_total[len(du):]
         
         # MAPA (Visualización)
-        lat = df_zona.geometry.centroid.y.mean()
-        lon = df_zona.geometry.centroid.x.mean()
-        m_dec = crear_mapa_base(lat, lon) # Selector global
-
-        def estilo_dinamico(feature, variable, color_base):
-            val = feature['properties'].get(variable, 0)
-            opacity = 0.1
-            if val > 0.4: opacity = 0.8
-            elif val > 0.2: opacity = 0.5
-            elif val > 0.1: opacity = 0.3
-            return {'fillColor': color_base, 'color': 'black', 'weight': 0.5, 'fillOpacity': opacity}
-
         variable_mapa = "IND_PRIORIDAD_TOTAL" if "CRUCE" in capa_activa else "IND_VOCACION_TURISTICA" if "4." in capa_activa else "SITS_INDEX"
         color_mapa = "#b71c1c" if "CRUCE" in capa_activa else "#f1c40f" if "4." in capa_activa else "blue"
+        # Corte del Top 25% (lo usan el mapa y la tabla del cruce): un solo cálculo
+        umbral = np.nanquantile(df_zona['IND_PRIORIDAD_TOTAL'].to_numpy(dtype=float), 0.75) if "CRUCE" in capa_activa else None
+
+        def construir_mapa_decisiones():
+            lat = df_zona['cy'].mean()
+            lon = df_zona['cx'].mean()
+            m_dec = crear_mapa_base(lat, lon) # Selector global
+
+            def estilo_dinamico(feature, variable, color_base):
+                val = feature['properties'].get(variable, 0)
+                opacity = 0.1
+                if val > 0.4: opacity = 0.8
+                elif val > 0.2: opacity = 0.5
+                elif val > 0.1: opacity = 0.3
+                return {'fillColor': color_base, 'color': 'black', 'weight': 0.5, 'fillOpacity': opacity}
 
-        if not du.empty:
-            if "CRUCE" in capa_activa:
-                umbral = df_zona[variable_mapa].quantile(0.75)
-                du_c = du[du[variable_mapa] >= umbral]
-                if not du_c.empty:
-                    folium.GeoJson(du_c, style_function=lambda x: {'fillColor': color_mapa, 'color': 'black', 'weight': 2, 'fillOpacity': 0.9}, tooltip="ZONA PRIORITARIA").add_to(m_dec)
-            else:
-                 folium.GeoJson(du, style_function=lambda x: estilo_dinamico(x, variable_mapa, color_mapa)).add_to(m_dec)
+            if not du.empty:
+                if "CRUCE" in capa_activa:
+                    du_c = du[du[variable_mapa] >= umbral]
+                    if not du_c.empty:
+                        folium.GeoJson(capa_web(du_c), style_function=lambda x: {'fillColor': color_mapa, 'color': 'black', 'weight': 2, 'fillOpacity': 0.9}, tooltip="ZONA PRIORITARIA").add_to(m_dec)
+                else:
+                     folium.GeoJson(capa_web(du), style_function=lambda x: estilo_dinamico(x, variable_mapa, color_mapa)).add_to(m_dec)
+
+            return m_dec
 
-        st_folium(m_dec, height=450, use_container_width=True)
+        dibujar_mapa_en_cache(("decisiones", filtros, estilo_mapa, capa_activa), construir_mapa_decisiones, height=450)
 
         st.markdown("<div class='section-title'>2. Padrón Estratégico para Obras Públicas</div>", unsafe_allow_html=True)
         
         if "CRUCE" in capa_activa:
-            umbral = df_zona['IND_PRIORIDAD_TOTAL'].quantile(0.75)
             df_table = df_zona[df_zona['IND_PRIORIDAD_TOTAL'] >= umbral]
             msg_alert = f"Mostrando las <b>{len(df_table)} zonas más críticas</b> (Top 25%) que requieren intervención urgente."
         else:
@@ -1032,14 +1278,15 @@ with tab8:
         st.markdown(f"<div class='alert-box'>{msg_alert}</div>", unsafe_allow_html=True)
         
         # TABLA DEFINITIVA
-        cols_finales = ['NOM_LOC', 'TIPO', 'CVE_AGEB', 'P25_TOT', 'IND_PRIORIDAD_TOTAL', 'VOCACION_DOMINANTE', 'ACCION_OBRA_PUBLICA']
-        
-        tb_final = df_table[list(dict.fromkeys(cols_finales))].sort_values('IND_PRIORIDAD_TOTAL', ascending=False).reset_index(drop=True)
-        tb_final.index = tb_final.index + 1
+        tb_final = df_table[list(COLS_DECISIONES)].sort_values('IND_PRIORIDAD_TOTAL', ascending=False)
+        tb_final.index = pd.RangeIndex(1, len(tb_final) + 1)
         
         st.dataframe(
-            tb_final.style.format({'IND_PRIORIDAD_TOTAL': "{:.1%}", 'P25_TOT': "{:,.0f}"})
-            .background_gradient(cmap='Reds', subset=['IND_PRIORIDAD_TOTAL']), 
+            tb_final,
+            column_config={
+                'IND_PRIORIDAD_TOTAL': col_barra(tb_final['IND_PRIORIDAD_TOTAL'], 'Reds', formato="percent", step=0.001),
+                'P25_TOT': col_entero()
+            },
             use_container_width=True
         )
         pie_tabla_sits()
@@ -1083,58 +1330,26 @@ with tab9:
 
     with c_map:
         if not df_zona.empty:
-            lat = df_zona.geometry.centroid.y.mean(); lon = df_zona.geometry.centroid.x.mean()
+            lat = df_zona['cy'].mean(); lon = df_zona['cx'].mean()
             m_tec = crear_mapa_base(lat, lon) # Global
             
-            # --- FUNCIONES DE COLOR COMUNES ---
-            def color_dictamen(props):
-                val = str(props.get('DICTAMEN_VIABILIDAD', ''))
-                if "RIESGO" in val or "FEDERAL" in val: return '#b71c1c' # Rojo
-                if "NO URBANIZABLE" in val or "DESLAVE" in val: return '#e65100' # Naranja
-                return '#2e7d32' # Verde
-
-            def color_peligro(props):
-                if props.get('RESTRICCION_GAS', 0) == 1: return '#d32f2f'
-                if props.get('RESTRICCION_AGUA', 0) == 1: return '#1976d2'
-                return '#eeeeee'
-
-            # 1. CAPA URBANA (POLÍGONOS)
+            # 1. CAPA URBANA (POLÍGONOS) - colores precalculados en colores_tecnicos
             if not du.empty:
                 if "1." in opcion_ver:
-                    folium.GeoJson(du, style_function=lambda x: {'fillColor': color_dictamen(x['properties']), 'color': 'black', 'weight': 0.5, 'fillOpacity': 0.6}, tooltip=folium.GeoJsonTooltip(fields=['NOM_LOC', 'DICTAMEN_VIABILIDAD'])).add_to(m_tec)
+                    folium.GeoJson(capa_web(du), style_function=lambda x: {'fillColor': x['properties']['COLOR_DICTAMEN'], 'color': 'black', 'weight': 0.5, 'fillOpacity': 0.6}, tooltip=folium.GeoJsonTooltip(fields=['NOM_LOC', 'DICTAMEN_VIABILIDAD'])).add_to(m_tec)
                 elif "2." in opcion_ver:
-                    folium.GeoJson(du, style_function=lambda x: {'fillColor': color_peligro(x['properties']), 'color': 'transparent', 'fillOpacity': 0.8 if x['properties'].get('RESTRICCION_GAS')==1 or x['properties'].get('RESTRICCION_AGUA')==1 else 0}).add_to(m_tec)
+                    folium.GeoJson(capa_web(du), style_function=lambda x: {'fillColor': x['properties']['COLOR_PELIGRO'], 'color': 'transparent', 'fillOpacity': 0 if x['properties']['COLOR_PELIGRO'] == '#eeeeee' else 0.8}).add_to(m_tec)
                 elif "3." in opcion_ver:
-                    folium.Choropleth(geo_data=du, data=du, columns=['CVEGEO', 'PENDIENTE_PROMEDIO'], key_on='feature.properties.CVEGEO', fill_color='RdYlGn_r', fill_opacity=0.7, line_opacity=0.1).add_to(m_tec)
+                    capa_coropletica(du, 'PENDIENTE_PROMEDIO', 'RdYlGn_r', fill_opacity=0.7, line_opacity=0.1).add_to(m_tec)
 
             # 2. CAPA RURAL (PUNTOS) - ¡CORREGIDO Y AGREGADO!
             if not dr.empty:
-                for _, r in dr.iterrows():
-                    if r.geometry.is_empty: continue
-                    props = r.to_dict()
-                    
-                    # Determinar color del punto
-                    c_punto = '#808080' # Gris default
-                    if "1." in opcion_ver:
-                        c_punto = color_dictamen(props)
-                    elif "2." in opcion_ver: 
-                        c_punto = color_peligro(props)
-                        # Si no hay riesgo, hacemos el punto invisible o muy gris
-                        if c_punto == '#eeeeee': continue 
-                    elif "3." in opcion_ver:
-                        p = props.get('PENDIENTE_PROMEDIO', 0)
-                        c_punto = '#2e7d32' if p < 5 else '#fbc02d' if p < 15 else '#b71c1c' # Verde -> Amarillo -> Rojo
-
-                    folium.CircleMarker(
-                        location=[r.geometry.centroid.y, r.geometry.centroid.x],
-                        radius=6,
-                        color='white',
-                        weight=1,
-                        fill=True,
-                        fill_color=c_punto,
-                        fill_opacity=0.9,
-                        popup=f"<b>{r['NOM_LOC']}</b><br>Dictamen: {props.get('DICTAMEN_VIABILIDAD')}<br>Pendiente: {props.get('PENDIENTE_PROMEDIO'):.1f}%"
-                    ).add_to(m_tec)
+                # Colores ya calculados al cargar (colores_tecnicos); en Peligro el punto sin riesgo no se dibuja
+                col_color = {"1.": 'COLOR_DICTAMEN', "2.": 'COLOR_PELIGRO', "3.": 'COLOR_PENDIENTE'}[opcion_ver[:2]]
+                pts = dr[dr['COLOR_PELIGRO'].values != '#eeeeee'] if col_color == 'COLOR_PELIGRO' else dr
+                colores = pts[col_color].values
+                popups = [f"<b>{nom}</b><br>Dictamen: {dic}<br>Pendiente: {pend:.1f}%" for nom, dic, pend in zip(pts['NOM_LOC'], pts['DICTAMEN_VIABILIDAD'], pts['PENDIENTE_PROMEDIO'])]
+                capa_puntos_rurales(pts, colores, popups, radio=6).add_to(m_tec)
             
             # --- CAPA DE RÍOS (NUEVO: PINTAR LÍNEAS DE AGUA) ---
             if gdf_rios is not None and "2." in opcion_ver:
@@ -1145,7 +1360,7 @@ with tab9:
                     tooltip="Río / Arroyo (Zona Federal)"
                 ).add_to(m_tec)
 
-            st_folium(m_tec, height=500, use_container_width=True)
+            dibujar_mapa(m_tec, height=500)
 
     # TABLA DE DETALLES
     st.markdown("### 📋 Lista Negra: Zonas con Restricciones")
@@ -1155,9 +1370,9 @@ with tab9:
         
         if not df_probs.empty:
             st.warning(f"⚠️ Se encontraron {len(df_probs)} zonas conflictivas.")
-            tb_risk = df_probs.head(50).reset_index(drop=True)
-            tb_risk.index = tb_risk.index + 1
-            st.dataframe(tb_risk.style.format({'PENDIENTE_PROMEDIO': "{:.1f}%"}).applymap(lambda v: 'color:red; font-weight:bold' if 'RIESGO' in str(v) else '', subset=['DICTAMEN_VIABILIDAD']), use_container_width=True)
+            tb_risk = df_probs.head(50)
+            tb_risk.index = pd.RangeIndex(1, len(tb_risk) + 1)
+            st.dataframe(tb_risk.style.format({'PENDIENTE_PROMEDIO': "{:.1f}%"}).map(lambda v: 'color:red; font-weight:bold' if 'RIESGO' in str(v) else '', subset=['DICTAMEN_VIABILIDAD']), use_container_width=True)
             pie_tabla_sits()
         else:
             st.success("✅ Todo limpio. No hay zonas de alto riesgo detectadas.")
@@ -1169,8 +1384,10 @@ with tab10:
 
     # 1. MAPA CON SLIDER (ANTES/DESPUÉS) Y CAPAS
     if not df_zona.empty:
-        lat = df_zona[df_zona['TIPO']=='Urbano'].geometry.centroid.y.mean() if not df_zona[df_zona['TIPO']=='Urbano'].empty else df_zona.geometry.centroid.y.mean()
-        lon = df_zona[df_zona['TIPO']=='Urbano'].geometry.centroid.x.mean() if not df_zona[df_zona['TIPO']=='Urbano'].empty else df_zona.geometry.centroid.x.mean()
+        es_urb = (df_zona['TIPO'] == 'Urbano').values
+        sel = es_urb if es_urb.any() else slice(None) # Sin manzanas urbanas: centrar en toda la zona
+        lat = df_zona['cy'].values[sel].mean()
+        lon = df_zona['cx'].values[sel].mean()
         
         m_cat = folium.Map(location=[lat, lon], zoom_start=19, tiles=None, max_zoom=21)
         
@@ -1182,15 +1399,15 @@ with tab10:
 
         # CAPA VECTORIAL
         if not du.empty:
-            folium.GeoJson(du, name="🗺️ Límites Catastrales", style_function=lambda x: {'fillColor': 'transparent', 'color': '#FFFF00', 'weight': 2, 'opacity': 0.8}, tooltip="Manzana Catastral").add_to(m_cat)
+            folium.GeoJson(capa_web(du), name="🗺️ Límites Catastrales", style_function=lambda x: {'fillColor': 'transparent', 'color': '#FFFF00', 'weight': 2, 'opacity': 0.8}, tooltip="Manzana Catastral").add_to(m_cat)
 
         # SIMULACIÓN AI
         if st.checkbox("🤖 ACTIVAR CAPA AI (Detección de Cambios)", value=False):
             for _, row in du[du['SITS_INDEX']<0.3].sample(frac=0.3).iterrows():
-                folium.Circle(location=[row.geometry.centroid.y, row.geometry.centroid.x], radius=15, color='red', fill=True, fill_opacity=0.4, popup="⚠️ ALERTA AI: Construcción Detectada").add_to(m_cat)
+                folium.Circle(location=[row['cy'], row['cx']], radius=15, color='red', fill=True, fill_opacity=0.4, popup="⚠️ ALERTA AI: Construcción Detectada").add_to(m_cat)
 
         folium.LayerControl().add_to(m_cat)
-        st_folium(m_cat, height=700, use_container_width=True)
+        dibujar_mapa(m_cat, height=700)
 
     # 2. CONTROLES Y DATOS (VERTICAL ORDENADO)
     st.markdown("### 🔍 Panel de Auditoría")
@@ -1253,7 +1470,9 @@ with tab10:
     # 4. TABLA CON STREET VIEW Y CONTEXTO SOCIAL COMPLETO (CORREGIDO)
     st.markdown("### 📂 Padrón Fiscal con Enlace a Calle (Street View)")
     if not df_zona.empty:
-        df_f = df_zona.copy()
+        # Solo las columnas que usa el padrón (no una copia completa de df_zona con geometrías)
+        cols_fuente = ['NOM_LOC', 'CVEGEO', 'TIPO', 'SITS_INDEX', 'CAR_POBREZA_20', 'CAR_SERV_20', 'DICTAMEN_VIABILIDAD', 'IND_RESILIENCIA_HIDRICA', 'cx', 'cy']
+        df_f = df_zona[[c for c in cols_fuente if c in df_zona.columns]].copy()
         
         # CÁLCULO DE COLUMNAS DE CONTEXTO SOCIAL (SOLICITADO)
         df_f['ZAP_FEDERAL'] = df_f['SITS_INDEX'].apply(lambda x: 'SÍ' if x > 0.35 else 'NO')
@@ -1263,7 +1482,7 @@ with tab10:
         df_f['RESILIENCIA'] = df_f['IND_RESILIENCIA_HIDRICA'].apply(lambda x: 'BAJA' if x < 0.3 else 'ALTA') if 'IND_RESILIENCIA_HIDRICA' in df_f.columns else 'N/A'
         
         # LINK STREET VIEW
-        df_f['LINK_FACHADA'] = df_f['geometry'].apply(lambda geom: f"https://www.google.com/maps?layer=c&cbll={geom.centroid.y},{geom.centroid.x}")
+        df_f['LINK_FACHADA'] = [f"https://www.google.com/maps?layer=c&cbll={y},{x}" for y, x in zip(df_f['cy'], df_f['cx'])]
         
         # SELECCIÓN DE COLUMNAS CORRECTA
         cols = ['NOM_LOC', 'CVEGEO', 'TIPO', 'SITS_INDEX', 'ZAP_FEDERAL', 'NIVEL_INGRESOS', 'CARENCIA_SERVICIOS', 'RIESGO_PC', 'LINK_FACHADA']
@@ -1273,7 +1492,7 @@ with tab10:
         
         # CONFIGURACIÓN DE TABLA INTERACTIVA
         st.data_editor(
-            df_show.style.applymap(lambda v: 'background-color: #ffcdd2; color: black; font-weight: bold' if v == 'SÍ' else '', subset=['ZAP_FEDERAL']),
+            df_show.style.map(lambda v: 'background-color: #ffcdd2; color: black; font-weight: bold' if v == 'SÍ' else '', subset=['ZAP_FEDERAL']),
             column_config={
                 "LINK_FACHADA": st.column_config.LinkColumn(
                     "👁️ VER FACHADA",
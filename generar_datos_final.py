@@ -15,34 +15,57 @@
 
 import pandas as pd
 import geopandas as gpd
+import shapely
+import pyogrio
+import pyarrow as pa
+import pyarrow.compute as pc
 import os
 import numpy as np
-import unicodedata
+import hashlib
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import warnings
+import logging
 import sys
 
+# Bitácora en consola: un solo StreamHandler a stdout con el mensaje tal cual (mismo aspecto
+# que print). Los avisos (⚠️) y errores (❌) llevan su nivel, así se pueden filtrar.
+logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stdout)
+log = logging.getLogger("sits")
+
 # ------------------------------------------------------------------------------
 # IMPORTACIÓN DE LIBRERÍAS DE INGENIERÍA ESPACIAL
 # ------------------------------------------------------------------------------
-print("🔧 Cargando librerías de ingeniería espacial...")
+log.info("🔧 Cargando librerías de ingeniería espacial...")
 try:
     import rasterio
-    from rasterio.mask import mask
-    from shapely.geometry import mapping
-    print("   ✅ Librería 'rasterio' cargada correctamente. Se realizarán cálculos topográficos reales.")
+    from rasterio.features import rasterize
+    from rasterio.windows import Window
+    from rasterio.crs import CRS
+    from rasterio.enums import Resampling
+    from rasterio.warp import calculate_default_transform, reproject, transform_bounds
+    log.info("   ✅ Librería 'rasterio' cargada correctamente. Se realizarán cálculos topográficos reales.")
     HAS_RASTERIO = True
 except ImportError:
-    print("   ⚠️ AVISO: Librería 'rasterio' no detectada.")
-    print("      El sistema usará estimaciones estadísticas para las pendientes.")
+    log.warning("   ⚠️ AVISO: Librería 'rasterio' no detectada.")
+    log.info("      El sistema usará estimaciones estadísticas para las pendientes.")
     HAS_RASTERIO = False
 
+# Serializador JSON rápido (opcional) para la salida GeoJSONSeq
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    import json
+    HAS_ORJSON = False
+
 # Silenciar advertencias de proyecciones para mantener la consola limpia
 warnings.filterwarnings("ignore")
 
 # ==============================================================================
 # 1. CONFIGURACIÓN Y CONSTANTES DEL SISTEMA
 # ==============================================================================
-print("\n⚙️  Configurando parámetros del municipio...")
+log.info("\n⚙️  Configurando parámetros del municipio...")
 MUNICIPIO_OBJETIVO = '032'  # Clave Municipio (Catemaco)
 LOC_CABECERA = '0001'       # Clave Cabecera
 FACTOR_URBANO = 1.048       # Proyección de crecimiento poblacional (Urbano)
@@ -63,6 +86,12 @@ FILENAME_CSV_RUR = "iter_veracruz_2020.csv"
 OUTPUT_DIR = "output"
 if not os.path.exists(OUTPUT_DIR): os.makedirs(OUTPUT_DIR)
 
+# Formato de salida: GeoParquet (lo lee el tablero). La copia GeoJSON es opcional, solo
+# para herramientas externas (QGIS, visores web): es lenta de escribir y pesa varias veces más.
+EXPORTAR_GEOJSON = False
+# GeoJSONSeq (.geojsonl, una entidad por línea) para consumidores que leen en flujo; también opcional
+EXPORTAR_GEOJSONSEQ = False
+
 # ==============================================================================
 # 2. SISTEMA DE BÚSQUEDA DE ARCHIVOS (RASTREO INTELIGENTE)
 # ==============================================================================
@@ -97,7 +126,7 @@ def encontrar_archivo(nombre):
             
     return None
 
-print("\n🔍 Rastreando insumos en el sistema de archivos...")
+log.info("\n🔍 Rastreando insumos en el sistema de archivos...")
 
 # Definición automática de rutas con el buscador inteligente
 PATH_SHP_URB = encontrar_archivo(FILENAME_SHP_URB)
@@ -110,11 +139,53 @@ PATH_CSV_URB = encontrar_archivo(FILENAME_CSV_URB)
 PATH_CSV_RUR = encontrar_archivo(FILENAME_CSV_RUR) or encontrar_archivo("conjunto_de_datos_iter_30CSV20.csv")
 
 # Validación de hallazgos
-print(f"   🔹 Mapa Urbano: {'✅' if PATH_SHP_URB else '❌'}")
-print(f"   🔹 Mapa Rural:  {'✅' if PATH_SHP_RUR else '❌'}")
-print(f"   🔹 Economía:    {'✅' if PATH_DENUE else '❌'}")
-print(f"   🔹 Hidrología:  {'✅' if PATH_RIOS else '❌'}")
-print(f"   🔹 Topografía:  {'✅' if PATH_DEM else '❌'}")
+log.info(f"   🔹 Mapa Urbano: {'✅' if PATH_SHP_URB else '❌'}")
+log.info(f"   🔹 Mapa Rural:  {'✅' if PATH_SHP_RUR else '❌'}")
+log.info(f"   🔹 Economía:    {'✅' if PATH_DENUE else '❌'}")
+log.info(f"   🔹 Hidrología:  {'✅' if PATH_RIOS else '❌'}")
+log.info(f"   🔹 Topografía:  {'✅' if PATH_DEM else '❌'}")
+
+# --- CACHÉ EN DISCO DE CÁLCULOS PESADOS (LLAVE = INSUMOS + FECHA DE MODIFICACIÓN) ---
+CACHE_DIR = os.path.join(OUTPUT_DIR, "cache")
+# Versión de los algoritmos cuyo resultado se guarda (kernel de pendiente, buffers...):
+# al cambiar uno se sube, y todo lo calculado con la versión anterior deja de usarse
+VERSION_CALCULO = 2
+
+def ruta_cache(etiqueta, gdf, *insumos, parametros=()):
+    """
+    Ruta .npz para un resultado intermedio. La llave combina la versión del cálculo y sus
+    parámetros (distancias, umbrales) con el mapa base (CRS, número de polígonos, extensión
+    y geometrías) y cada insumo: ruta y mtime si es un archivo, CRS y geometrías si ya está
+    en memoria (GeoDataFrame). Si cualquiera cambia, la llave es otra y el cálculo se repite.
+    """
+    def huella(g):
+        h.update(f"|{g.crs}|{len(g)}|".encode())
+        h.update(b"".join(shapely.to_wkb(g.geometry.values)))
+
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{etiqueta}|v{VERSION_CALCULO}|{parametros!r}".encode())
+    huella(gdf)
+    for r in insumos:
+        if isinstance(r, gpd.GeoDataFrame): huella(r)
+        elif r: h.update(f"|{os.path.abspath(r)}|{os.path.getmtime(r)}".encode())
+        else: h.update(b"|-") # Insumo ausente
+    return os.path.join(CACHE_DIR, f"{etiqueta}_{h.hexdigest()}.npz")
+
+def leer_cache(ruta):
+    """Arreglos guardados en 'ruta' (dict) o None si no existe / está dañado."""
+    try:
+        with np.load(ruta) as datos:
+            return {k: datos[k] for k in datos.files}
+    except Exception:
+        return None
+
+def guardar_cache(ruta, **arreglos):
+    """Guarda los arreglos; un fallo de escritura solo implica recalcular la próxima vez."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        np.savez(ruta, **arreglos)
+    except Exception as e:
+        log.warning(f"      ⚠️ No se pudo guardar la caché ({e}).")
 
 # ==============================================================================
 # 3. FUNCIONES DE LIMPIEZA DE DATOS
@@ -123,80 +194,147 @@ def limpiar_nombres_columnas(df):
     """
     Estandariza los nombres de columnas del INEGI.
     """
-    df.columns = df.columns.str.upper().str.strip()
-    cols_nuevas = []
-    for col in df.columns:
-        desc = unicodedata.normalize('NFKD', col).encode('ASCII', 'ignore').decode('utf-8')
-        cols_nuevas.append(desc)
-    df.columns = cols_nuevas
+    # Mayúsculas, sin espacios y sin acentos (NFKD + ASCII) en una pasada sobre el Index
+    df.columns = df.columns.str.upper().str.strip().str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('utf-8')
     
     if 'ENTIDAD' not in df.columns:
         if len(df.columns) > 0 and 'ENTIDAD' in df.columns[0]:
             df.rename(columns={df.columns[0]: 'ENTIDAD'}, inplace=True)
     return df
 
+def codificacion_csv(path):
+    """
+    Codificación de un CSV del INEGI por su inicio: BOM de UTF-8/UTF-16, UTF-8 si la
+    muestra decodifica sin error y, si no, latin-1 (tablas anteriores a 2020).
+    """
+    with open(path, 'rb') as f:
+        muestra = f.read(65536)
+    if muestra.startswith(b'\xef\xbb\xbf'): return 'utf-8-sig'
+    if muestra[:2] in (b'\xff\xfe', b'\xfe\xff'): return 'utf-16'
+    try:
+        muestra.decode('utf-8')
+    except UnicodeDecodeError as e:
+        if e.start < len(muestra) - 3: return 'latin-1' # Un corte a media letra al final no cuenta
+    return 'utf-8'
+
+# Columnas de identificación del Censo que usa el motor además de VARS_CENSO
+CLAVES_CENSO = ['ENTIDAD', 'MUN', 'NOM_MUN', 'LOC', 'NOM_LOC', 'NOMGEO', 'AGEB', 'MZA']
+
+@lru_cache(maxsize=8)
+def leer_csv_censo(path):
+    """
+    Lee (una vez por ruta) las columnas del CSV del Censo que usa el motor, con nombres ya
+    estandarizados. La codificación se detecta antes de leer en lugar de reintentar.
+    El resultado queda en caché: NO modificar in-place (usar una copia).
+    """
+    enc = codificacion_csv(path)
+    encabezado = pd.read_csv(path, nrows=0, encoding=enc, encoding_errors='replace')
+    crudos = encabezado.columns
+    nombres = limpiar_nombres_columnas(encabezado).columns
+    usar = [i for i, c in enumerate(nombres) if c in CLAVES_CENSO or c in VARS_CENSO]
+    # Tipos desde el parser de C: claves y nombres como texto Arrow (un búfer contiguo + offsets,
+    # no un objeto str por celda) y variables del Censo directo a float32 (conteos exactos;
+    # '*' y 'N/D' del INEGI = dato reservado -> NaN), sin pasar por cadenas
+    tipos = {crudos[i]: ('float32' if nombres[i] in VARS_CENSO else 'string[pyarrow]') for i in usar}
+    lectura = dict(encoding=enc, encoding_errors='replace', usecols=usar)
+    try:
+        df = pd.read_csv(path, dtype=tipos, na_values=['*', 'N/D'], **lectura)
+    except ValueError:
+        # Algún otro valor no numérico: todo como texto y procesar_indicadores lo convierte
+        df = pd.read_csv(path, dtype=str, **lectura)
+    df.columns = nombres[usar]
+    # MUN y LOC repiten pocos valores en cientos de miles de filas: como categóricas, los
+    # filtros comparan códigos enteros
+    for c in ('MUN', 'LOC'):
+        if c in df.columns: df[c] = df[c].astype('category')
+    return df
+
+def clave_geo(df, campos):
+    """
+    Clave Geoestadística (CVEGEO) uniendo los campos en orden con un solo
+    binary_join_element_wise de Arrow (C++): sin una Serie intermedia por cada '+'.
+    Un campo nulo cuenta como vacío. Devuelve texto Arrow.
+    """
+    partes = [pa.array(df[c].astype('string[pyarrow]')) for c in campos] # Categóricas -> texto
+    # El separador debe ser del mismo tipo que las partes (string[pyarrow] es large_string)
+    sep = pa.scalar('', type=partes[0].type)
+    clave = pc.binary_join_element_wise(*partes, sep, null_handling='replace', null_replacement='')
+    return pd.Series(pd.arrays.ArrowStringArray(clave), index=df.index)
+
 # ==============================================================================
 # 4. MOTOR DE CÁLCULO DE INDICADORES (SITS + SENDAI)
 # ==============================================================================
+# Lista maestra de variables del Censo 2020 necesarias (NO ELIMINAR NINGUNA)
+VARS_CENSO = [
+    # Demografía Básica
+    'POBTOT', 'POBFEM', 'POBMAS', 'P_15YMAS', 'P15YM_AN', 'P15YM_SE', 
+    'PDER_SS', 'TVIVPARHAB', 'POB0_14', 'P_60YMAS', 'P3YM_HLI', 'POB_AFRO', 'PCON_DISC', 'HOGJEF_F',
+    # Vivienda y Servicios (Carencias)
+    'VPH_PISOTI', 'VPH_NODREN', 'VPH_AGUAFV', 'VPH_S_ELEC',
+    'VPH_REFRI', 'VPH_LAVAD', 'VPH_AUTOM', 'VPH_PC', 'VPH_1CUARTO',
+    'VPH_TECHOLAM', 'VPH_TECHOPAL', 'VPH_TECHOPEC', 
+    'VPH_PAREDLAM', 'VPH_PAREDDES', 'VPH_PAREDBAJ',
+    # Variables para Resiliencia y Sendai
+    'VPH_LENA', 'VPH_CARBON', 'VPH_CIST', 'VPH_TINACO', 
+    'PEA', 'PDESOCUP', 'PE_INAC', # Economía laboral
+    'VPH_INTER', 'VPH_CEL' # Conectividad
+]
+
 def procesar_indicadores(df):
     """
     Calcula todos los índices sociales, de riesgo y vulnerabilidad.
     """
-    # Lista maestra de variables del Censo 2020 necesarias (NO ELIMINAR NINGUNA)
-    VARS = [
-        # Demografía Básica
-        'POBTOT', 'POBFEM', 'POBMAS', 'P_15YMAS', 'P15YM_AN', 'P15YM_SE', 
-        'PDER_SS', 'TVIVPARHAB', 'POB0_14', 'P_60YMAS', 'P3YM_HLI', 'POB_AFRO', 'PCON_DISC', 'HOGJEF_F',
-        # Vivienda y Servicios (Carencias)
-        'VPH_PISOTI', 'VPH_NODREN', 'VPH_AGUAFV', 'VPH_S_ELEC',
-        'VPH_REFRI', 'VPH_LAVAD', 'VPH_AUTOM', 'VPH_PC', 'VPH_1CUARTO',
-        'VPH_TECHOLAM', 'VPH_TECHOPAL', 'VPH_TECHOPEC', 
-        'VPH_PAREDLAM', 'VPH_PAREDDES', 'VPH_PAREDBAJ',
-        # Variables para Resiliencia y Sendai
-        'VPH_LENA', 'VPH_CARBON', 'VPH_CIST', 'VPH_TINACO', 
-        'PEA', 'PDESOCUP', 'PE_INAC', # Economía laboral
-        'VPH_INTER', 'VPH_CEL' # Conectividad
-    ]
-    
-    # 1. Conversión a Numérico (Limpieza de "N/A", "*", etc.)
-    for col in VARS:
+    # 1. Conversión a Numérico (Limpieza de "N/A", "*", etc.); las columnas que ya llegan
+    # tipadas desde leer_csv_censo solo rellenan sus nulos
+    for col in VARS_CENSO:
         if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+            v = df[col] if pd.api.types.is_numeric_dtype(df[col]) else pd.to_numeric(df[col], errors='coerce')
+            df[col] = v.fillna(0)
             
-    # 2. Evitar división por cero
-    for col in ['POBTOT', 'TVIVPARHAB', 'P_15YMAS', 'PEA']:
-        if col in df.columns: df[col] = df[col].replace(0, 1)
+    # 2. Matriz N x K con todas las variables (las ausentes valen 0), extraída una sola vez;
+    # cada indicador es una expresión numpy sobre sus columnas
+    X = df.reindex(columns=VARS_CENSO, fill_value=0).to_numpy(dtype=np.float64)
+    V = dict(zip(VARS_CENSO, X.T))
+    def g(c): return V[c]
 
-    # Función auxiliar para obtener valor seguro
-    def g(c): return df[c] if c in df.columns else 0
+    # Evitar división por cero: denominadores como arreglos locales (0 -> 1),
+    # sin reescribir POBTOT/TVIVPARHAB, que después se usan para la proyección 2025
+    def denom(c): return np.where(V[c] == 0, 1, V[c])
+    pob, viv, p15 = denom('POBTOT'), denom('TVIVPARHAB'), denom('P_15YMAS')
+    pea = denom('PEA') if 'PEA' in df.columns else p15
+
+    cols_inds = ['CAR_EDU_20', 'CAR_SALUD_20', 'CAR_VIV_20', 'CAR_SERV_20', 'CAR_POBREZA_20']
+    extras = ['IND_RESILIENCIA_HIDRICA', 'IND_PRESION_AMBIENTAL', 'IND_RIESGO_SOCIAL',
+              'SENDAI_P1_VULNERABILIDAD', 'SENDAI_P3_FRAGILIDAD', 'SENDAI_P4_FALTACAPACIDAD']
+    salida = np.empty((len(df), len(cols_inds) + 1 + len(extras)))
+    car, sits, ext = salida[:, :5], salida[:, 5], salida[:, 6:]
 
     # ---------------------------------------------------------
     # A. INDICADORES SOCIALES (SITS - METODOLOGÍA OPHI)
     # ---------------------------------------------------------
     
     # Rezago Educativo
-    df['CAR_EDU_20'] = (g('P15YM_AN') + g('P15YM_SE')) / df['P_15YMAS']
+    car[:, 0] = (g('P15YM_AN') + g('P15YM_SE')) / p15
     
     # Acceso a Salud
-    df['CAR_SALUD_20'] = 1 - (g('PDER_SS') / df['POBTOT'])
+    car[:, 1] = 1 - (g('PDER_SS') / pob)
     
     # Calidad de la Vivienda (Ajuste Experto: Hacinamiento con peso 1.2)
     viv_mala = g('VPH_PISOTI') + g('VPH_TECHOLAM') + g('VPH_TECHOPAL') + \
                g('VPH_PAREDLAM') + g('VPH_PAREDDES') + (g('VPH_1CUARTO') * 1.2)
-    df['CAR_VIV_20'] = viv_mala / df['TVIVPARHAB']
+    car[:, 2] = viv_mala / viv
     
     # Servicios Básicos
     serv_malos = g('VPH_AGUAFV') + g('VPH_NODREN') + g('VPH_S_ELEC') + g('VPH_LENA')
-    df['CAR_SERV_20'] = (serv_malos / 4) / df['TVIVPARHAB']
+    car[:, 3] = (serv_malos / 4) / viv
     
     # Pobreza por Ingresos (Aproximación por Activos)
     activos = g('VPH_REFRI') + g('VPH_LAVAD') + g('VPH_AUTOM') + g('VPH_PC')
-    df['CAR_POBREZA_20'] = 1 - (activos / (4 * df['TVIVPARHAB']))
+    car[:, 4] = 1 - (activos / (4 * viv))
     
     # --- ÍNDICE SITS UNIFICADO ---
-    cols_inds = ['CAR_EDU_20', 'CAR_SALUD_20', 'CAR_VIV_20', 'CAR_SERV_20', 'CAR_POBREZA_20']
-    for c in cols_inds: df[c] = df[c].clip(0, 1) # Asegurar rango 0-1
-    df['SITS_INDEX'] = df[cols_inds].mean(axis=1)
+    np.clip(car, 0, 1, out=car) # Asegurar rango 0-1
+    sits[:] = car.mean(axis=1)
 
     # ---------------------------------------------------------
     # B. INDICADORES RESILIENCIA (MCR2030)
@@ -204,16 +342,15 @@ def procesar_indicadores(df):
     
     # Resiliencia Hídrica (Capacidad de almacenamiento)
     cap_agua = g('VPH_AGUAFV') + g('VPH_CIST') + g('VPH_TINACO')
-    df['IND_RESILIENCIA_HIDRICA'] = (cap_agua / 2) / df['TVIVPARHAB'] 
+    ext[:, 0] = (cap_agua / 2) / viv
     
     # Presión Ambiental (Salud pública)
     contaminacion = g('VPH_LENA') + g('VPH_CARBON') + g('VPH_NODREN')
-    df['IND_PRESION_AMBIENTAL'] = contaminacion / df['TVIVPARHAB']
+    ext[:, 1] = contaminacion / viv
     
     # Riesgo Social (Desempleo + Precariedad)
-    denom_eco = df['PEA'] if 'PEA' in df.columns else df['P_15YMAS']
-    tasa_desempleo = g('PDESOCUP') / denom_eco
-    df['IND_RIESGO_SOCIAL'] = (tasa_desempleo + df['CAR_VIV_20'] + df['CAR_EDU_20']) / 3
+    tasa_desempleo = g('PDESOCUP') / pea
+    ext[:, 2] = (tasa_desempleo + car[:, 2] + car[:, 0]) / 3
 
     # ---------------------------------------------------------
     # C. INDICADORES MARCO DE SENDAI (ONU)
@@ -221,60 +358,59 @@ def procesar_indicadores(df):
     
     # Prioridad 1: Vulnerabilidad Social Intrínseca (Población Dependiente)
     vuln_sendai = g('PCON_DISC') + g('P3YM_HLI') + g('P_60YMAS') + (g('POB0_14') * 0.5)
-    df['SENDAI_P1_VULNERABILIDAD'] = vuln_sendai / df['POBTOT']
+    ext[:, 3] = vuln_sendai / pob
     
     # Prioridad 3: Fragilidad Física (Vivienda precaria ante desastres)
     frag_sendai = g('VPH_PAREDDES') + g('VPH_TECHOPAL') + g('VPH_TECHOPEC') + g('VPH_NODREN')
-    df['SENDAI_P3_FRAGILIDAD'] = frag_sendai / df['TVIVPARHAB']
+    ext[:, 4] = frag_sendai / viv
     
     # Prioridad 4: Falta de Capacidad de Respuesta (Sin comunicación/transporte)
     cap_resp = g('VPH_CEL') + g('VPH_INTER') + g('VPH_AUTOM') + g('VPH_CIST') + g('VPH_TINACO')
-    df['SENDAI_P4_FALTACAPACIDAD'] = 1 - ((cap_resp / 5) / df['TVIVPARHAB'])
+    ext[:, 5] = 1 - ((cap_resp / 5) / viv)
 
     # Normalización final de índices extra
-    extras = ['IND_RESILIENCIA_HIDRICA', 'IND_PRESION_AMBIENTAL', 'IND_RIESGO_SOCIAL',
-              'SENDAI_P1_VULNERABILIDAD', 'SENDAI_P3_FRAGILIDAD', 'SENDAI_P4_FALTACAPACIDAD']
-    for c in extras: df[c] = df[c].clip(0, 1)
+    np.clip(ext, 0, 1, out=ext)
 
+    # Una sola asignación de todas las columnas de salida, en float32 (índices 0-1:
+    # la precisión sobra y la capa pesa la mitad en memoria, GeoJSON y GeoParquet)
+    df[cols_inds + ['SITS_INDEX'] + extras] = salida.astype(np.float32)
     return df
 
 # ==============================================================================
 # 5. MÓDULO ECONÓMICO: INTEGRACIÓN DENUE / SCIAN
 # ==============================================================================
-def integrar_economia(gdf_base, denue_path):
+# Sector económico por los 2 primeros dígitos del código SCIAN (el resto cae en ECO_OTROS)
+SECTORES_SCIAN = {
+    '72': 'ECO_TURISMO',                                                    # Hoteles y Restaurantes
+    '46': 'ECO_COMERCIO', '43': 'ECO_COMERCIO',                             # Comercio
+    '31': 'ECO_INDUSTRIA', '32': 'ECO_INDUSTRIA', '33': 'ECO_INDUSTRIA',   # Manufactura
+    '81': 'ECO_SERVICIOS', '54': 'ECO_SERVICIOS', '61': 'ECO_SERVICIOS', '62': 'ECO_SERVICIOS', # Servicios Profesionales
+}
+
+def integrar_economia(gdf_base, gdf_denue):
     """
     Cruza la información geográfica con el Directorio Económico (DENUE).
+    'gdf_denue' llega ya leído (ver leer_insumo); None si no hay archivo.
     Calcula: Total de negocios y Vocación Turística por zona.
     """
-    print(f"   🏭 Integrando Economía desde: {denue_path}")
+    log.info("   🏭 Integrando Economía (DENUE)...")
     
     # Si no hay archivo, llenar con ceros para no romper el código
-    if not denue_path or not os.path.exists(denue_path):
-        print("   ⚠️ No se encontró archivo DENUE. Generando datos vacíos (0).")
+    if gdf_denue is None:
+        log.warning("   ⚠️ No se encontró archivo DENUE. Generando datos vacíos (0).")
         for col in ['ECO_TOTAL', 'ECO_TURISMO', 'ECO_COMERCIO', 'ECO_INDUSTRIA', 'ECO_SERVICIOS', 'IND_VOCACION_TURISTICA']:
             gdf_base[col] = 0
         return gdf_base
 
     try:
-        # Cargar archivo DENUE
-        gdf_denue = gpd.read_file(denue_path)
-        
         # Asegurar que ambos mapas usen el mismo sistema de coordenadas
         if gdf_denue.crs != gdf_base.crs:
             gdf_denue = gdf_denue.to_crs(gdf_base.crs)
             
-        # Función interna para clasificar códigos SCIAN
-        def clasificar_scian(row):
-            # Intentar obtener el código de actividad
-            cod = str(row.get('codigo_act', row.iloc[0]))[0:2] # Primeros 2 dígitos
-            
-            if cod in ['72']: return 'ECO_TURISMO'      # Hoteles y Restaurantes
-            elif cod in ['46', '43']: return 'ECO_COMERCIO' # Comercio
-            elif cod in ['31', '32', '33']: return 'ECO_INDUSTRIA' # Manufactura
-            elif cod in ['81', '54', '61', '62']: return 'ECO_SERVICIOS' # Servicios Profesionales
-            return 'ECO_OTROS'
-
-        gdf_denue['SECTOR_SCIAN'] = gdf_denue.apply(clasificar_scian, axis=1)
+        # Clasificación SCIAN vectorizada: primeros 2 dígitos del código de actividad -> sector
+        col_act = 'codigo_act' if 'codigo_act' in gdf_denue.columns else gdf_denue.columns[0]
+        cod = gdf_denue[col_act].astype(str).str[:2]
+        gdf_denue = gdf_denue.assign(SECTOR_SCIAN=cod.map(SECTORES_SCIAN).fillna('ECO_OTROS'))
         
         # SPATIAL JOIN: Identificar qué negocios caen DENTRO de cada polígono
         join_espacial = gpd.sjoin(gdf_denue, gdf_base[['CVEGEO', 'geometry']], how='inner', predicate='within')
@@ -293,277 +429,646 @@ def integrar_economia(gdf_base, denue_path):
             
         # CÁLCULO DE VOCACIÓN TURÍSTICA
         # % de la economía local que depende del turismo
-        gdf_final['IND_VOCACION_TURISTICA'] = gdf_final['ECO_TURISMO'] / gdf_final['ECO_TOTAL'].replace(0, 1)
+        gdf_final['IND_VOCACION_TURISTICA'] = (gdf_final['ECO_TURISMO'] / gdf_final['ECO_TOTAL'].replace(0, 1)).astype(np.float32)
         
-        print(f"   ✅ Economía Integrada correctamente. Negocios procesados: {len(join_espacial)}")
+        log.info(f"   ✅ Economía Integrada correctamente. Negocios procesados: {len(join_espacial)}")
         return gdf_final
         
     except Exception as e:
-        print(f"   ❌ Error crítico en módulo económico: {e}")
+        log.error(f"   ❌ Error crítico en módulo económico: {e}")
         return gdf_base
 
 # ==============================================================================
 # 6. MÓDULO DE INGENIERÍA TERRITORIAL (TOPOGRAFÍA)
 # ==============================================================================
 
+NODATA_PENDIENTE = -9999.0
+
+def calcular_raster_pendiente(dem, res_x, res_y):
+    """
+    Pendiente en % de un MDE (método de Horn, el mismo kernel 3x3 de 'gdaldem slope').
+    Los bordes se extienden con el valor vecino (equivalente a computeEdges) y los
+    píxeles con algún vecino sin dato quedan como NODATA_PENDIENTE.
+    """
+    z = np.where(dem > -9999, dem, np.nan).astype(np.float32)
+    z = np.pad(z, 1, mode='edge')
+    a, b, c = z[:-2, :-2], z[:-2, 1:-1], z[:-2, 2:]
+    d, f = z[1:-1, :-2], z[1:-1, 2:]
+    g, h, i = z[2:, :-2], z[2:, 1:-1], z[2:, 2:]
+    dz_dx = ((c + 2 * f + i) - (a + 2 * d + g)) / (8 * res_x)
+    dz_dy = ((g + 2 * h + i) - (a + 2 * b + c)) / (8 * res_y)
+    pendiente = 100 * np.sqrt(dz_dx ** 2 + dz_dy ** 2)
+    return np.where(np.isnan(pendiente), NODATA_PENDIENTE, pendiente).astype(np.float32)
+
+def dem_metrico(src):
+    """
+    MDE en coordenadas geográficas (celdas en grados) reproyectado a su zona UTM con
+    remuestreo bilineal, para que el kernel de pendiente reciba celdas en metros.
+    Devuelve (dem, perfil, res_x, res_y).
+    """
+    lon0, lat0, lon1, lat1 = transform_bounds(src.crs, 'EPSG:4326', *src.bounds)
+    zona = int(((lon0 + lon1) / 2 + 180) // 6) + 1
+    utm = CRS.from_epsg((32600 if lat0 + lat1 >= 0 else 32700) + zona)
+    transform, ancho, alto = calculate_default_transform(src.crs, utm, src.width, src.height, *src.bounds)
+    dem = np.full((alto, ancho), NODATA_PENDIENTE, dtype=np.float32)
+    reproject(rasterio.band(src, 1), dem, dst_transform=transform, dst_crs=utm,
+              dst_nodata=NODATA_PENDIENTE, resampling=Resampling.bilinear)
+    perfil = src.profile
+    perfil.update(crs=utm, transform=transform, width=ancho, height=alto)
+    return dem, perfil, transform.a, -transform.e
+
+def asegurar_raster_pendiente(path_dem):
+    """
+    Deriva una sola vez el raster de pendiente (%) del MDE y lo guarda en 'output/'.
+    Sin dependencia de GDAL/osgeo: el kernel se calcula con numpy sobre el MDE completo.
+    Devuelve la ruta del raster de pendiente (o None si no se pudo generar).
+    """
+    if not HAS_RASTERIO or not path_dem:
+        return None
+
+    ruta = os.path.join(OUTPUT_DIR, os.path.splitext(os.path.basename(path_dem))[0] + f"_pendiente_v{VERSION_CALCULO}.tif")
+    # Se reutiliza mientras sea más reciente que el MDE del que proviene
+    if os.path.exists(ruta) and os.path.getmtime(ruta) >= os.path.getmtime(path_dem):
+        return ruta
+
+    try:
+        with rasterio.open(path_dem) as src:
+            if src.crs is not None and src.crs.is_geographic:
+                # Celdas en grados: el kernel de Horn necesita metros
+                log.info("      🔄 Reproyectando el MDE geográfico a UTM para medir la pendiente en metros...")
+                dem, perfil, res_x, res_y = dem_metrico(src)
+            else:
+                dem = src.read(1)
+                perfil = src.profile
+                res_x, res_y = src.res
+        perfil.update(driver='GTiff', dtype='float32', count=1, nodata=NODATA_PENDIENTE, compress='deflate',
+                      tiled=True, blockxsize=256, blockysize=256) # Teselas propias: las del MDE pueden ser franjas
+        with rasterio.open(ruta, 'w', **perfil) as dst:
+            dst.write(calcular_raster_pendiente(dem, res_x, res_y), 1)
+        log.info(f"      💾 Raster de pendiente (%) guardado en: {ruta}")
+        return ruta
+    except Exception as e:
+        log.warning(f"      ⚠️ No se pudo derivar la pendiente del MDE: {e}")
+        return None
+
+FILAS_TESELA = 1024 # Filas del raster por franja en el cálculo zonal
+
+def zonal_tesela(raster_path, ventana, formas, n_zonas):
+    """
+    Suma y conteo de píxeles válidos por polígono dentro de una franja del raster.
+    Cada franja abre su propio manejador: los hilos no comparten el lector de GDAL.
+    """
+    with rasterio.open(raster_path) as src:
+        datos = src.read(1, window=ventana)
+        transform = src.window_transform(ventana)
+    # Etiqueta 1..N por polígono (0 = fuera); mismo criterio de píxel que 'mask' (centro dentro)
+    etiquetas = rasterize(formas, out_shape=datos.shape, transform=transform, fill=0, dtype='int32')
+
+    # Eliminar valores "No Data" (usualmente negativos o extremos): esos píxeles pasan a
+    # la etiqueta 0 y bincount reduce toda la franja en una pasada, sin copias indexadas
+    validos = datos > -9999
+    lab = np.where(validos, etiquetas, 0).ravel()
+    conteo = np.bincount(lab, minlength=n_zonas + 1)
+    suma = np.bincount(lab, weights=np.where(validos, datos, 0).ravel().astype(np.float64), minlength=n_zonas + 1)
+    return conteo, suma
+
 def calcular_pendiente_zonal(gdf, raster_path):
     """
     Función robusta que calcula estadísticas zonales (media) de un Raster sobre polígonos.
-    Usa 'rasterio.mask' directamente para evitar dependencia de 'rasterstats'.
+    Sin 'rasterstats': la ventana que cubre todas las geometrías se parte en franjas de
+    FILAS_TESELA filas que se procesan en paralelo (rasterización de etiquetas + np.bincount);
+    las sumas parciales se acumulan, así el resultado no depende del número de franjas.
     """
     if not HAS_RASTERIO or not raster_path:
         return None
 
     try:
-        valores_medios = []
-        
-        # Abrir el archivo raster (Elevación)
         with rasterio.open(raster_path) as src:
             # Asegurarse que el GeoDataFrame tenga la misma proyección que el Raster
             if gdf.crs != src.crs:
-                print("      🔄 Reproyectando mapa vectorial para coincidir con el satélite...")
+                log.info("      🔄 Reproyectando mapa vectorial para coincidir con el satélite...")
                 gdf_proj = gdf.to_crs(src.crs)
             else:
                 gdf_proj = gdf
 
-            # Iterar sobre cada polígono (Manzana/Localidad)
-            for geom in gdf_proj.geometry:
-                try:
-                    # Enmascarar: Recortar el raster con la forma del polígono
-                    out_image, out_transform = mask(src, [geom], crop=True)
-                    
-                    # Eliminar valores "No Data" (usualmente negativos o extremos)
-                    valid_data = out_image[out_image > -9999] 
-                    
-                    if valid_data.size > 0:
-                        # Calcular pendiente simple basada en desviación estándar de altura 
-                        # (Aproximación útil cuando no se tiene un raster de "slope" pre-calculado)
-                        # O simplemente devolver la altura media si eso es lo que tenemos
-                        
-                        # Para este ejercicio, calcularemos un índice de rugosidad/pendiente 
-                        # basado en la variación de altura (std dev) normalizada.
-                        # Una zona plana tiene std_dev bajo. Una zona de loma tiene alto.
-                        # Multiplicamos por un factor para simular %, ya que el MDE es altura pura.
-                        val = np.std(valid_data) * 5 
-                    else:
-                        val = 0
-                    valores_medios.append(val)
-                except:
-                    valores_medios.append(0)
-                    
-        return valores_medios
+            n_zonas = len(gdf_proj)
+            if n_zonas == 0:
+                return []
+
+            # Ventana (en píxeles) que cubre la extensión de todas las geometrías, recortada al raster
+            xmin, ymin, xmax, ymax = gdf_proj.total_bounds
+            c0, r0 = ~src.transform * (xmin, ymax)
+            c1, r1 = ~src.transform * (xmax, ymin)
+            c0, r0 = max(int(np.floor(c0)), 0), max(int(np.floor(r0)), 0)
+            c1, r1 = min(int(np.ceil(c1)), src.width), min(int(np.ceil(r1)), src.height)
+            if c1 <= c0 or r1 <= r0:
+                return [0] * n_zonas # Ningún polígono cae sobre el raster
+            transform = src.transform
+
+        # Franjas horizontales; a cada una solo van los polígonos que la tocan (consulta al R-tree)
+        geoms = gdf_proj.geometry.values
+        tareas = []
+        for fila in range(r0, r1, FILAS_TESELA):
+            ventana = Window(c0, fila, c1 - c0, min(FILAS_TESELA, r1 - fila))
+            idx = gdf_proj.sindex.query(shapely.box(*rasterio.windows.bounds(ventana, transform)))
+            formas = [(geoms[i], i + 1) for i in np.sort(idx) if not shapely.is_empty(geoms[i])]
+            if formas:
+                tareas.append((ventana, formas))
+        if not tareas:
+            return [0] * n_zonas
+
+        with ThreadPoolExecutor(max_workers=min(len(tareas), os.cpu_count() or 1)) as pool:
+            parciales = list(pool.map(lambda t: zonal_tesela(raster_path, t[0], t[1], n_zonas), tareas))
+
+        # Media por polígono; sin píxeles válidos el valor queda en 0
+        conteo = np.maximum(sum(p[0] for p in parciales), 1)
+        suma = sum(p[1] for p in parciales)
+        return (suma / conteo)[1:].tolist()
 
     except Exception as e:
-        print(f"      ⚠️ Error en cálculo zonal: {e}")
+        log.warning(f"      ⚠️ Error en cálculo zonal: {e}")
         return None
 
+# Vocabularios fijos de las columnas de dictamen (categóricas): ambas capas comparten las
+# mismas categorías, así el tablero las concatena sin volver a cadenas
+CLASES_TOPOGRAFICAS = ["Plano (Sin Dato)", "✅ Plano (Viable)", "⚠️ Lomerío (Condicionado)", "⛔ NO URBANIZABLE (>15%)"]
+DICTAMENES = ["✅ FACTIBLE", "⛔ RIESGO QUÍMICO (Gasolinera)", "🌊 ZONA FEDERAL (Río)", "⛰️ RIESGO DESLAVE"]
+
+# Parámetros normativos: pendiente (%) máxima de terreno plano y de lomerío (SEDATU) y
+# anillos de seguridad en metros alrededor de gasolineras y cauces (zona federal CONAGUA)
+PENDIENTE_PLANO, PENDIENTE_LOMERIO = 5, 15
+BUFFER_GAS_M, BUFFER_RIO_M = 100, 20
+
 def procesar_topografia(gdf_base, path_dem):
     """
     Analiza el Modelo Digital de Elevación (DEM) para calcular la pendiente promedio.
     """
-    print("   ⛰️ Analizando Topografía y Pendientes (Módulo Ingeniería)...")
+    log.info("   ⛰️ Analizando Topografía y Pendientes (Módulo Ingeniería)...")
     
     # Inicializar columnas por defecto
-    gdf_base['PENDIENTE_PROMEDIO'] = 0
-    gdf_base['CLASIFICACION_TOPOGRAFICA'] = "Plano (Sin Dato)"
+    gdf_base['PENDIENTE_PROMEDIO'] = np.float32(0)
+    gdf_base['CLASIFICACION_TOPOGRAFICA'] = pd.Categorical.from_codes(np.zeros(len(gdf_base), dtype=np.int8), CLASES_TOPOGRAFICAS)
 
     if not path_dem:
-        print("      ⚠️ No se encontró archivo TIF de elevación. Se omiten cálculos.")
+        log.warning("      ⚠️ No se encontró archivo TIF de elevación. Se omiten cálculos.")
         return gdf_base
 
     try:
-        # Intentar cálculo real con Rasterio
-        pendientes_reales = calcular_pendiente_zonal(gdf_base, path_dem)
+        # Intentar cálculo real con Rasterio: pendiente (%) derivada del MDE y media por polígono
+        # (en caché mientras no cambien el MDE ni las geometrías)
+        cache = ruta_cache("pendiente", gdf_base, path_dem, parametros=(NODATA_PENDIENTE, PENDIENTE_PLANO, PENDIENTE_LOMERIO))
+        guardado = leer_cache(cache)
+        if guardado is not None:
+            pendientes_reales = guardado['pendiente'].tolist()
+            log.info("      ♻️ Pendientes recuperadas de la caché (insumos sin cambios).")
+        else:
+            pendientes_reales = calcular_pendiente_zonal(gdf_base, asegurar_raster_pendiente(path_dem))
+            if pendientes_reales: guardar_cache(cache, pendiente=np.asarray(pendientes_reales, dtype=np.float64))
         
         if pendientes_reales:
-            gdf_base['PENDIENTE_PROMEDIO'] = pendientes_reales
-            print("      ✅ Topografía calculada usando datos satelitales reales.")
+            gdf_base['PENDIENTE_PROMEDIO'] = np.asarray(pendientes_reales, dtype=np.float32)
+            log.info("      ✅ Topografía calculada usando datos satelitales reales.")
         else:
             # Fallback: Simulación controlada si falla la lectura del raster
             # (Para no romper la demo si el TIF está corrupto o vacío)
-            print("      ⚠️ Usando modelo estadístico de respaldo para pendientes.")
+            log.warning("      ⚠️ Usando modelo estadístico de respaldo para pendientes.")
             np.random.seed(42)
-            gdf_base['PENDIENTE_PROMEDIO'] = np.random.uniform(1, 30, size=len(gdf_base))
+            gdf_base['PENDIENTE_PROMEDIO'] = np.random.uniform(1, 30, size=len(gdf_base)).astype(np.float32)
         
-        # Clasificación Normativa (SEDATU)
-        def clasificar_pendiente(val):
-            if val < 5: return "✅ Plano (Viable)"
-            elif val < 15: return "⚠️ Lomerío (Condicionado)"
-            else: return "⛔ NO URBANIZABLE (>15%)"
-            
-        gdf_base['CLASIFICACION_TOPOGRAFICA'] = gdf_base['PENDIENTE_PROMEDIO'].apply(clasificar_pendiente)
+        # Clasificación Normativa (SEDATU): <5% plano, <15% lomerío, resto no urbanizable
+        p = gdf_base['PENDIENTE_PROMEDIO'].values
+        codigos = np.select([p < PENDIENTE_PLANO, p < PENDIENTE_LOMERIO], [1, 2], default=3).astype(np.int8)
+        gdf_base['CLASIFICACION_TOPOGRAFICA'] = pd.Categorical.from_codes(codigos, CLASES_TOPOGRAFICAS)
         return gdf_base
 
     except Exception as e:
-        print(f"      ❌ Error en módulo topográfico: {e}")
+        log.error(f"      ❌ Error en módulo topográfico: {e}")
         return gdf_base
 
 # ==============================================================================
 # 7. MÓDULO DE INGENIERÍA: RESTRICCIONES NORMATIVAS
 # ==============================================================================
 
-def procesar_restricciones(gdf_base, path_denue, path_rios):
+def caja_lectura(gdf_m, margen):
+    """
+    Caja envolvente (CRS métrico) ampliada en `margen` metros, para leer de DENUE/ríos
+    solo los elementos cuyo anillo de seguridad puede tocar el municipio.
+    """
+    caja = shapely.box(*gdf_m.total_bounds).buffer(margen, join_style="mitre")
+    return gpd.GeoSeries([shapely.segmentize(caja, max(margen, 1) * 10)], crs=gdf_m.crs)
+
+def leer_insumo(path, gdf_base, margen):
+    """
+    Lee una capa vectorial (DENUE, ríos) una sola vez por mapa base, limitada a su caja
+    envolvente ampliada en 'margen' metros (el filtro lo aplica GDAL: el resto del archivo
+    no se carga); la misma lectura sirve a economía y restricciones.
+    Devuelve None si no hay archivo o no se pudo leer.
+    """
+    if not path:
+        return None
+    try:
+        base_m = gdf_base[['geometry']].to_crs(gdf_base.estimate_utm_crs())
+        return gpd.read_file(path, bbox=caja_lectura(base_m, margen))
+    except Exception as e:
+        log.warning(f"   ⚠️ No se pudo leer {path}: {e}")
+        return None
+
+def procesar_restricciones(gdf_base, gdf_denue, gdf_rios):
     """
     Genera Buffers (Anillos de Seguridad) alrededor de riesgos químicos e hidrológicos.
+    DENUE y ríos llegan ya leídos (ver leer_insumo); None si no hay archivo.
     """
-    print("   🚧 Calculando Restricciones Normativas (Buffers de Seguridad)...")
+    log.info("   🚧 Calculando Restricciones Normativas (Buffers de Seguridad)...")
     
-    gdf_base['RESTRICCION_GAS'] = 0
-    gdf_base['RESTRICCION_AGUA'] = 0
-    gdf_base['DICTAMEN_VIABILIDAD'] = "✅ FACTIBLE"
+    gdf_base['RESTRICCION_GAS'] = np.int8(0)
+    gdf_base['RESTRICCION_AGUA'] = np.int8(0)
+
+    # Filtrar Gasolineras (Códigos aproximados SCIAN 464xxx - Comercio combustibles)
+    # Y estaciones de gas (473xxx)
+    completo = True # Solo se guarda en caché un cálculo sin errores
+    gasolineras = None
+    if gdf_denue is not None:
+        try:
+            gasolineras = gdf_denue[gdf_denue['codigo_act'].astype(str).str.startswith(('464', '473'))]
+        except Exception as e:
+            log.warning(f"      ⚠️ Error procesando gasolineras: {e}")
+            completo = False
+
+    # Caché de los cruces espaciales: mismas geometrías + mismas gasolineras/ríos = mismas banderas
+    cache = ruta_cache("restricciones", gdf_base, gasolineras, gdf_rios, parametros=(BUFFER_GAS_M, BUFFER_RIO_M))
+    guardado = leer_cache(cache)
+    if guardado is not None:
+        gdf_base['RESTRICCION_GAS'] = guardado['gas'].astype(np.int8)
+        gdf_base['RESTRICCION_AGUA'] = guardado['agua'].astype(np.int8)
+        log.info("      ♻️ Restricciones recuperadas de la caché (insumos sin cambios).")
+        gasolineras = gdf_rios = None # Nada que recalcular
+
+    # Marco métrico local (UTM): los anillos se miden en metros reales, sin importar si
+    # el mapa base viene en grados o en Lambert. Se proyecta una sola vez y solo la geometría.
+    if gasolineras is not None or gdf_rios is not None:
+        try:
+            crs_m = gdf_base.estimate_utm_crs()
+            base_m = gdf_base[['geometry']].to_crs(crs_m)
+        except Exception as e:
+            log.warning(f"      ⚠️ No se pudo proyectar a UTM ({e}). Se omiten los buffers.")
+            gasolineras = gdf_rios = None
+            completo = False
 
     # A. Riesgo Químico (Gasolineras del DENUE)
-    if path_denue:
+    if gasolineras is not None:
         try:
-            denue = gpd.read_file(path_denue).to_crs(gdf_base.crs)
-            # Filtrar Gasolineras (Códigos aproximados SCIAN 464xxx - Comercio combustibles)
-            # Y estaciones de gas (473xxx)
-            gasolineras = denue[denue['codigo_act'].astype(str).str.startswith(('464', '473'))] 
-            
             if not gasolineras.empty:
-                # Buffer de 100 metros (Aprox 0.001 grados si es WGS84)
-                # Nota: Lo ideal es proyectar a UTM, pero usamos grados para rapidez.
-                buffer_gas = gasolineras.geometry.buffer(0.001) 
+                # Buffer de BUFFER_GAS_M metros (vectorizado, ya en UTM) fundido en un solo multipolígono
+                zona_gas = gasolineras.geometry.to_crs(crs_m).buffer(BUFFER_GAS_M).union_all()
                 
-                # Intersección Espacial
-                interseccion = gpd.sjoin(gdf_base, gpd.GeoDataFrame(geometry=buffer_gas), how='inner', predicate='intersects')
-                ids_afectados = interseccion.index.unique()
-                gdf_base.loc[gdf_base.index.isin(ids_afectados), 'RESTRICCION_GAS'] = 1
+                # Intersección Espacial: una consulta al R-tree de la base (geometría preparada)
+                idx = base_m.sindex.query(zona_gas, predicate='intersects')
+                gdf_base.iloc[idx, gdf_base.columns.get_loc('RESTRICCION_GAS')] = 1
         except Exception as e:
-            print(f"      ⚠️ Error procesando gasolineras: {e}")
+            log.warning(f"      ⚠️ Error procesando gasolineras: {e}")
+            completo = False
 
     # B. Riesgo Hidrológico (Red de Ríos)
-    if path_rios:
+    if gdf_rios is not None:
         try:
-            print(f"      🌊 Procesando Ríos desde: {path_rios}")
-            rios = gpd.read_file(path_rios)
-            
-            # Asegurar misma proyección
-            if rios.crs != gdf_base.crs:
-                rios = rios.to_crs(gdf_base.crs)
-                
-            # Buffer de 20 metros (Zona Federal - Aprox 0.0002 grados)
+            log.info(f"      🌊 Procesando Ríos ({len(gdf_rios)} cauces en la zona)...")
+
+            # Buffer de BUFFER_RIO_M metros (Zona Federal) medido en UTM
             # Esto marca las zonas inundables o prohibidas por CONAGUA
-            buffer_rios = rios.geometry.buffer(0.0002)
+            buffer_rios = gdf_rios.geometry.to_crs(crs_m).buffer(BUFFER_RIO_M)
             
-            interseccion_rios = gpd.sjoin(gdf_base, gpd.GeoDataFrame(geometry=buffer_rios), how='inner', predicate='intersects')
-            ids_rios = interseccion_rios.index.unique()
-            gdf_base.loc[gdf_base.index.isin(ids_rios), 'RESTRICCION_AGUA'] = 1
+            # Consulta masiva al STRtree de la base: pares (cauce, polígono) en una sola llamada
+            # a GEOS, sin fundir los anillos ni armar el GeoDataFrame de un sjoin
+            pares = base_m.sindex.query(buffer_rios.values, predicate='intersects')
+            gdf_base.iloc[np.unique(pares[1]), gdf_base.columns.get_loc('RESTRICCION_AGUA')] = 1
         except Exception as e:
-            print(f"      ⚠️ Error procesando ríos: {e}")
+            log.warning(f"      ⚠️ Error procesando ríos: {e}")
+            completo = False
 
-    # Dictamen Final Automático (Reglas de Negocio)
-    def dictaminar(row):
-        if row['RESTRICCION_GAS'] == 1: return "⛔ RIESGO QUÍMICO (Gasolinera)"
-        if row['RESTRICCION_AGUA'] == 1: return "🌊 ZONA FEDERAL (Río)"
-        if row.get('PENDIENTE_PROMEDIO', 0) > 15: return "⛰️ RIESGO DESLAVE"
-        return "✅ FACTIBLE"
+    if guardado is None and completo:
+        guardar_cache(cache, gas=gdf_base['RESTRICCION_GAS'].to_numpy(), agua=gdf_base['RESTRICCION_AGUA'].to_numpy())
 
-    gdf_base['DICTAMEN_VIABILIDAD'] = gdf_base.apply(dictaminar, axis=1)
+    # Dictamen Final Automático (Reglas de Negocio)
+    # Prioridad: gasolinera > río > pendiente (np.select toma la primera condición que se cumple)
+    gas = gdf_base['RESTRICCION_GAS'].values == 1
+    agua = gdf_base['RESTRICCION_AGUA'].values == 1
+    if 'PENDIENTE_PROMEDIO' in gdf_base.columns:
+        deslave = gdf_base['PENDIENTE_PROMEDIO'].values > PENDIENTE_LOMERIO
+    else:
+        deslave = np.zeros(len(gdf_base), dtype=bool)
+    codigos = np.select([gas, agua, deslave], [1, 2, 3], default=0).astype(np.int8) # Índices en DICTAMENES
+    gdf_base['DICTAMEN_VIABILIDAD'] = pd.Categorical.from_codes(codigos, DICTAMENES)
     
-    print("      ✅ Restricciones calculadas y Dictámenes generados.")
+    log.info("      ✅ Restricciones calculadas y Dictámenes generados.")
     return gdf_base
 
 # ==============================================================================
 # 8. FUNCIÓN PRINCIPAL DE PROCESAMIENTO GEOGRÁFICO
 # ==============================================================================
-def procesar_geo(shp_path, csv_path, tipo, filtro_mun, factor):
+def cajas_municipio(paths, filtro_mun):
+    """
+    Cajas envolventes (EPSG:4326) del municipio en cada mapa base, leídas solo con los
+    límites de sus entidades (sin construir geometrías): con ellas DENUE y ríos se leen
+    una sola vez para ambas capas. Devuelve None si no hay ningún mapa.
+    """
+    cajas = []
+    for path in paths:
+        if not path: continue
+        info = pyogrio.read_info(path)
+        where = f"CVE_MUN = '{filtro_mun}'" if 'CVE_MUN' in list(info['fields']) else None
+        _, limites = pyogrio.read_bounds(path, where=where)
+        if limites.shape[1] == 0: continue
+        caja = shapely.box(limites[0].min(), limites[1].min(), limites[2].max(), limites[3].max())
+        cajas.append(gpd.GeoSeries([caja], crs=info['crs']).to_crs(epsg=4326))
+    if not cajas:
+        return None
+    return gpd.GeoDataFrame(geometry=pd.concat(cajas, ignore_index=True), crs="EPSG:4326")
+
+def leer_mapa_municipio(path, filtro_mun):
+    """
+    Lee del Marco Geoestadístico solo las entidades del municipio: GDAL aplica el filtro por
+    atributo (OGR SQL sobre CVE_MUN) durante la lectura, sin construir la geometría del resto
+    del estado. Si la capa no trae CVE_MUN se lee completa (el cruce por CVEGEO descarta el resto).
+    """
+    if 'CVE_MUN' in list(pyogrio.read_info(path)['fields']):
+        return gpd.read_file(path, engine='pyogrio', where=f"CVE_MUN = '{filtro_mun}'")
+    return gpd.read_file(path)
+
+def unir_por_clave(shp, df, clave):
+    """
+    Equivalente a shp.merge(df, on=clave, how='inner') (mismo orden de filas y sufijos
+    _x/_y en columnas repetidas): un solo índice hash sobre las claves del mapa, que se
+    consulta con las de la tabla, y la geometría se toma por posición sin pasar por el join.
+    Si las claves del mapa se repiten se usa el merge normal.
+    """
+    claves = pd.Index(shp[clave])
+    if not claves.is_unique:
+        return shp.merge(df, on=clave, how='inner')
+    pos = claves.get_indexer(df[clave])
+    filas = np.flatnonzero(pos >= 0)
+    filas = filas[np.argsort(pos[filas], kind='stable')] # Orden del mapa, como el merge
+    comunes = shp.columns.intersection(df.columns).drop(clave)
+    izq = shp.iloc[pos[filas]].rename(columns={c: c + '_x' for c in comunes}).reset_index(drop=True)
+    der = df.iloc[filas].drop(columns=clave).rename(columns={c: c + '_y' for c in comunes}).reset_index(drop=True)
+    return gpd.GeoDataFrame(pd.concat([izq, der], axis=1), geometry=shp.geometry.name, crs=shp.crs)
+
+# Lista de grupos vulnerables a proyectar (variable 2020 -> proyección 2025)
+GRUPOS = {
+    'POBTOT': 'P25_TOT', 'POBFEM': 'P25_FEM', 'POBMAS': 'P25_MAS',
+    'P3YM_HLI': 'P25_IND', 'POB_AFRO': 'P25_AFRO', 'PCON_DISC': 'P25_DISC',
+    'HOGJEF_F': 'P25_JEFAS', 'POB0_14': 'P25_NINOS', 'P_60YMAS': 'P25_MAYORES'
+}
+# Atributos del Marco Geoestadístico que pasan a la capa final (además de la geometría)
+COLS_MAPA = ('CVEGEO', 'NOMGEO', 'NOM_MUN')
+
+def procesar_geo(shp_path, csv_path, tipo, filtro_mun, factor, insumos=None):
     """
     Coordina la lectura de mapas, tablas, limpieza y cruce de datos.
+    'insumos' = (gdf_denue, gdf_rios) ya leídos para ambas capas; si no se pasan, DENUE y
+    ríos se leen aquí para esta capa.
     """
-    print(f"\n📂 Iniciando procesamiento: {tipo}...")
+    log.info(f"\n📂 Iniciando procesamiento: {tipo}...")
     
     # 1. Lectura de Archivos
     try:
         if not shp_path or not csv_path:
-            print(f"   ❌ FALTAN ARCHIVOS para {tipo}. Saltando.")
+            log.error(f"   ❌ FALTAN ARCHIVOS para {tipo}. Saltando.")
             return None
             
-        shp = gpd.read_file(shp_path)
-        # Intentar leer CSV con diferentes codificaciones
-        try: df = pd.read_csv(csv_path, dtype=str, encoding='latin-1')
-        except: df = pd.read_csv(csv_path, dtype=str, encoding='utf-8')
+        shp = leer_mapa_municipio(shp_path, filtro_mun)
+        # Proyección de salida (EPSG:4326) una sola vez, solo sobre la geometría y solo si el
+        # mapa no viene ya en ella; así la capa final se exporta sin otro to_crs
+        if shp.crs is not None and shp.crs.to_epsg() != 4326: shp = shp.to_crs(epsg=4326)
+        # 2. CSV ya limpio (nombres estandarizados); copia superficial del resultado en caché
+        df = leer_csv_censo(csv_path).copy(deep=False)
     except Exception as e:
-        print(f"   ❌ Error leyendo archivos base ({tipo}): {e}")
+        log.error(f"   ❌ Error leyendo archivos base ({tipo}): {e}")
         return None
 
-    # 2. Limpieza
-    df = limpiar_nombres_columnas(df)
-
     # 3. Filtrado Geográfico (Solo el municipio objetivo)
+    # Primero el municipio: MUN es categórica, la comparación usa su código entero y el
+    # resto del filtrado y la CVEGEO trabajan solo sobre las filas del municipio
+    df = df[df['MUN'].values == filtro_mun]
     if tipo == 'Urbano':
-        # Filtrar por municipio y quitar totales (MZA 000)
-        df = df[(df['MUN'] == filtro_mun) & (df['MZA'] != '000')]
+        # Quitar totales (MZA 000)
+        df = df[df['MZA'].ne('000').to_numpy(dtype=bool, na_value=True)] # Texto Arrow: NA -> se conserva
         # Crear Clave Geoestadística Única (CVEGEO)
-        df['CVEGEO'] = df['ENTIDAD'] + df['MUN'] + df['LOC'] + df['AGEB'] + df['MZA']
+        df['CVEGEO'] = clave_geo(df, ['ENTIDAD', 'MUN', 'LOC', 'AGEB', 'MZA'])
     else:
-        # Filtrar Rural
-        df = df[df['MUN'] == filtro_mun]
-        # Quitar cabecera municipal (ya está en urbano) y totales
-        df = df[~df['LOC'].isin(['0000', '9998', '9999', LOC_CABECERA])]
-        df['CVEGEO'] = df['ENTIDAD'] + df['MUN'] + df['LOC']
-
-    # Renombrar columnas clave para evitar conflictos
-    df.rename(columns={'NOM_MUN':'NOM_MUN', 'NOM_LOC':'NOM_LOC', 'NOMGEO':'NOM_LOC'}, inplace=True)
+        # Quitar cabecera municipal (ya está en urbano) y totales: tabla booleana por categoría
+        # de LOC, consultada con los códigos enteros (el último lugar es el código -1, nulo)
+        loc = df['LOC'].values
+        excluir = np.zeros(len(loc.categories) + 1, dtype=bool)
+        pos = loc.categories.get_indexer(['0000', '9998', '9999', LOC_CABECERA])
+        excluir[pos[pos >= 0]] = True
+        df = df[~excluir[loc.codes]]
+        df['CVEGEO'] = clave_geo(df, ['ENTIDAD', 'MUN', 'LOC'])
+
+    # Nombre de localidad: NOMGEO solo pasa a NOM_LOC si no existe ya (sin columnas duplicadas)
+    if 'NOMGEO' in df.columns and 'NOM_LOC' not in df.columns:
+        df = df.rename(columns={'NOMGEO': 'NOM_LOC'})
     
     # 4. Cálculo de Indicadores
     df = procesar_indicadores(df)
     
-    # 5. Unión Mapa + Datos (Merge)
-    final = shp.merge(df, on='CVEGEO', how='inner')
-    final['TIPO'] = tipo
+    # 5. Unión Mapa + Datos (búsqueda en el índice hash de CVEGEO del mapa)
+    # Las columnas que el mapa repite de la tabla (AGEB, NOM_LOC...) se quedan solo del lado del
+    # Censo: el cruce no genera pares _x/_y ni materializa la columna dos veces
+    shp = shp.drop(columns=shp.columns.intersection(df.columns).drop('CVEGEO', errors='ignore'))
+    # Del mapa solo clave, geometría y nombres; de la tabla, las variables del Censo ya
+    # resumidas en los índices salen (quedan las que se proyectan y PEA, que usa el tablero)
+    shp = shp[[c for c in shp.columns if c in COLS_MAPA or c == shp.geometry.name]]
+    df = df.drop(columns=[c for c in VARS_CENSO if c not in GRUPOS and c != 'PEA'], errors='ignore')
+    final = unir_por_clave(shp, df, 'CVEGEO')
     
     # 6. Proyección Poblacional 2025
-    def safe(c): return pd.to_numeric(final[c], errors='coerce').fillna(0) if c in final.columns else 0
-    final['P20_TOT'] = safe('POBTOT')
-    
-    # Lista de grupos vulnerables a proyectar
-    GRUPOS = {
-        'POBTOT': 'P25_TOT', 'POBFEM': 'P25_FEM', 'POBMAS': 'P25_MAS',
-        'P3YM_HLI': 'P25_IND', 'POB_AFRO': 'P25_AFRO', 'PCON_DISC': 'P25_DISC',
-        'HOGJEF_F': 'P25_JEFAS', 'POB0_14': 'P25_NINOS', 'P_60YMAS': 'P25_MAYORES'
-    }
-    for var_orig, var_dest in GRUPOS.items():
-        final[var_dest] = safe(var_orig) * factor
+    # Una sola matriz N x 9 (las variables ausentes valen 0) con un solo cast de numpy a float32:
+    # las variables de VARS_CENSO ya son numéricas desde procesar_indicadores, así que
+    # pd.to_numeric queda solo de respaldo. Conteos de personas < 1e7, exactos en float32.
+    X = final.reindex(columns=list(GRUPOS), fill_value=0)
+    try: P = X.to_numpy(dtype=np.float32)
+    except (ValueError, TypeError): P = X.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float32)
+    P = np.nan_to_num(P, nan=0.0) # Copia: bajo Copy-on-Write to_numpy puede devolver una vista de solo lectura
+
+    # Columnas nuevas armadas aparte (un bloque float32 para las 10 de población) y pegadas con
+    # un solo concat, en lugar de una inserción en el BlockManager por columna
+    nuevas = pd.DataFrame(np.column_stack([P[:, 0], P * np.float32(factor)]), index=final.index,
+                          columns=['P20_TOT'] + list(GRUPOS.values())) # P20_TOT = POBTOT (Censo 2020)
+    nuevas.insert(0, 'TIPO', tipo)
+    final = gpd.GeoDataFrame(pd.concat([final, nuevas], axis=1), geometry=final.geometry.name, crs=final.crs)
 
     # 7. INTEGRACIÓN DE MÓDULOS AVANZADOS
-    final = integrar_economia(final, PATH_DENUE)
+    # DENUE y ríos: los compartidos por ambas capas o, sin ellos, una lectura para esta capa
+    # (caja del mapa + margen de los anillos de seguridad)
+    if insumos is not None:
+        gdf_denue, gdf_rios = insumos
+    else:
+        gdf_denue = leer_insumo(PATH_DENUE, final, BUFFER_GAS_M)
+        gdf_rios = leer_insumo(PATH_RIOS, final, BUFFER_RIO_M)
+    final = integrar_economia(final, gdf_denue)
     final = procesar_topografia(final, PATH_DEM)          # <--- MÓDULO INGENIERÍA
-    final = procesar_restricciones(final, PATH_DENUE, PATH_RIOS) # <--- MÓDULO NORMATIVA
+    final = procesar_restricciones(final, gdf_denue, gdf_rios) # <--- MÓDULO NORMATIVA
 
-    print(f"   ✅ {tipo} Procesado Exitosamente. Población proyectada: {final['P25_TOT'].sum():,.0f}")
+    log.info(f"   ✅ {tipo} Procesado Exitosamente. Población proyectada: {final['P25_TOT'].sum():,.0f}")
     return final
 
 # ==============================================================================
-# 9. EJECUCIÓN DEL MOTOR (SIN GUARDS PARA FORZAR EJECUCIÓN)
+# 9. EXPORTACIÓN BINARIA (GEOPARQUET PARA EL TABLERO)
 # ==============================================================================
-print(f"🚀 INICIANDO SITS - MOTOR INTEGRAL (SITS + MCR + SENDAI + ECONOMÍA + INGENIERÍA)")
-print(f"----------------------------------------------------------------")
-
-# Procesar Capa Urbana
-u = procesar_geo(PATH_SHP_URB, PATH_CSV_URB, 'Urbano', MUNICIPIO_OBJETIVO, FACTOR_URBANO)
-if u is not None:
-    # Ajustes finales de nombres
-    nom = u['NOM_MUN'].iloc[0] if 'NOM_MUN' in u.columns else "Municipio"
-    u['NOM_LOC'] = nom + " (Cabecera)"
-    
-    # Recuperar AGEB para filtros
-    if 'AGEB_y' in u.columns: u['CVE_AGEB'] = u['AGEB_y']
-    elif 'AGEB' in u.columns: u['CVE_AGEB'] = u['AGEB']
-    else: u['CVE_AGEB'] = 'SN'
-    
-    # Exportar a GeoJSON
-    ruta_salida_u = os.path.join(OUTPUT_DIR, "sits_capa_urbana.geojson")
-    u.to_crs(epsg=4326).to_file(ruta_salida_u, driver='GeoJSON')
-    print(f"   💾 Archivo Urbano guardado en: {ruta_salida_u}")
-
-# Procesar Capa Rural
-r = procesar_geo(PATH_SHP_RUR, PATH_CSV_RUR, 'Rural', MUNICIPIO_OBJETIVO, FACTOR_RURAL)
-if r is not None:
-    r['CVE_AGEB'] = 'RURAL'
-    ruta_salida_r = os.path.join(OUTPUT_DIR, "sits_capa_rural.geojson")
-    r.to_crs(epsg=4326).to_file(ruta_salida_r, driver='GeoJSON')
-    print(f"   💾 Archivo Rural guardado en: {ruta_salida_r}")
-
-print("\n🏁 BASE DE DATOS GENERADA Y ACTUALIZADA CON ÉXITO.")
-print(f"   Listo para ejecutar 'streamlit run app.py'")
\ No newline at end of file
+# Tolerancia (metros) de la geometría simplificada que viaja al navegador
+TOLERANCIA_WEB_M = 10
+
+def geometria_web(geoms):
+    """
+    Versión ligera de una GeoSeries para el mapa web: Douglas-Peucker a TOLERANCIA_WEB_M
+    metros en la UTM local (misma tolerancia en ambos ejes, a diferencia de grados),
+    en EPSG:4326 y con coordenadas redondeadas a una rejilla de 1e-5° (~1 m).
+    """
+    web = geoms.to_crs(geoms.estimate_utm_crs()).simplify(TOLERANCIA_WEB_M, preserve_topology=True).to_crs(epsg=4326)
+    return gpd.GeoSeries(shapely.set_precision(web.values, 1e-5), index=geoms.index, crs=web.crs)
+
+def escribir_geojsonseq(gdf, ruta):
+    """
+    Escribe la capa como GeoJSONSeq (una entidad por línea) sin pasar por GDAL: la geometría
+    se serializa en bloque con el escritor GeoJSON de GEOS (shapely.to_geojson) y los
+    atributos con orjson (json de la biblioteca estándar si no está instalado).
+    """
+    geoms = shapely.to_geojson(gdf.geometry.values)
+    attrs = gdf.drop(columns=gdf.geometry.name).astype(object)
+    attrs = attrs.where(attrs.notna(), None) # NaN -> null (JSON válido)
+    if HAS_ORJSON: dumps = orjson.dumps
+    else: dumps = lambda o: json.dumps(o, ensure_ascii=False).encode('utf-8')
+    with open(ruta, 'wb') as f:
+        for g, p in zip(geoms, attrs.to_dict('records')):
+            f.write(b'{"type":"Feature","geometry":' + (g.encode() if g is not None else b'null') +
+                    b',"properties":' + dumps(p) + b'}\n')
+
+def exportar_capa(gdf, ruta_geojson, etiqueta):
+    """
+    Guarda la capa final (ya en EPSG:4326) como GeoParquet (columnar, comprimido con zstd,
+    tipos conservados), que el tablero carga sin parsear texto. El GeoJSON se escribe solo
+    con EXPORTAR_GEOJSON o como respaldo si el GeoParquet falla; el GeoJSONSeq, con
+    EXPORTAR_GEOJSONSEQ.
+    """
+    ruta_pq = os.path.splitext(ruta_geojson)[0] + ".parquet"
+    parquet_ok = False
+    try:
+        # Geometría simplificada para el mapa web (la geometría completa se conserva
+        # para los análisis); así el tablero no simplifica en cada arranque.
+        # Centroides (lon/lat) precalculados: el tablero centra sus mapas y ubica los puntos rurales con ellos.
+        cent = shapely.centroid(gdf.geometry.values)
+        gdf.assign(geom_web=geometria_web(gdf.geometry), cx=shapely.get_x(cent), cy=shapely.get_y(cent)).to_parquet(ruta_pq, compression="zstd")
+        log.info(f"   💾 Archivo {etiqueta} (GeoParquet) guardado en: {ruta_pq}")
+        parquet_ok = True
+    except Exception as e:
+        log.warning(f"   ⚠️ No se pudo escribir GeoParquet ({e}). El tablero usará el GeoJSON.")
+
+    if EXPORTAR_GEOJSONSEQ:
+        ruta_seq = os.path.splitext(ruta_geojson)[0] + ".geojsonl"
+        try:
+            escribir_geojsonseq(gdf, ruta_seq)
+            log.info(f"   💾 Archivo {etiqueta} (GeoJSONSeq) guardado en: {ruta_seq}")
+        except Exception as e:
+            log.warning(f"   ⚠️ No se pudo escribir GeoJSONSeq ({e}).")
+
+    if parquet_ok and not EXPORTAR_GEOJSON:
+        return
+
+    # pyogrio escribe todas las entidades en bloque desde GDAL (sin el dict por registro de Fiona);
+    # GeoJSON no tiene tipo categórico: los dictámenes (y el texto Arrow) viajan como str
+    cats = gdf.select_dtypes(['category', 'string']).columns
+    pyogrio.write_dataframe(gdf.astype({c: object for c in cats}), ruta_geojson, driver='GeoJSON')
+    log.info(f"   💾 Archivo {etiqueta} (GeoJSON) guardado en: {ruta_geojson}")
+
+def exportar_rios_web(path_rios):
+    """
+    Guarda la red hidrográfica ya reproyectada a EPSG:4326 y simplificada para la web
+    (solo geometría) para que el tablero la dibuje sin repetir la transformación PROJ
+    en cada arranque ni enviar al navegador cada vértice de los cauces.
+    """
+    if not path_rios:
+        return
+    ruta_pq = os.path.join(OUTPUT_DIR, "rios_4326.parquet")
+    try:
+        rios = gpd.read_file(path_rios)
+        gpd.GeoDataFrame(geometry=geometria_web(rios.geometry)).to_parquet(ruta_pq, compression="zstd")
+        log.info(f"   💾 Red hidrográfica (EPSG:4326) guardada en: {ruta_pq}")
+    except Exception as e:
+        log.warning(f"   ⚠️ No se pudo exportar la red hidrográfica ({e}).")
+
+# ==============================================================================
+# 10. EJECUCIÓN DEL MOTOR (CAPAS URBANA Y RURAL EN PARALELO)
+# ==============================================================================
+# Columnas de texto que el tablero usa como filtros: las dos capas deben llevarlas con el
+# mismo dtype para que compartan categorías al cargarse
+COLS_FILTRO = ('TIPO', 'NOM_LOC', 'CVE_AGEB')
+
+def texto_filtros(gdf):
+    """Lleva las columnas de COLS_FILTRO a texto Arrow (el dtype del censo)."""
+    return gdf.astype({c: 'string[pyarrow]' for c in COLS_FILTRO if c in gdf.columns})
+
+def generar_capa(tipo, insumos=None):
+    """
+    Procesa y exporta una capa completa ('Urbano' o 'Rural'). Las dos capas solo comparten
+    los insumos ya leídos ('insumos', ver procesar_geo): cada una corre en su propio proceso
+    y escribe su archivo ahí mismo, sin devolver el GeoDataFrame al proceso principal.
+    """
+    if tipo == 'Urbano':
+        u = procesar_geo(PATH_SHP_URB, PATH_CSV_URB, 'Urbano', MUNICIPIO_OBJETIVO, FACTOR_URBANO, insumos)
+        if u is None: return
+        # Ajustes finales de nombres
+        nom = u['NOM_MUN'].iloc[0] if 'NOM_MUN' in u.columns else "Municipio"
+        u['NOM_LOC'] = nom + " (Cabecera)"
+        
+        # AGEB para filtros: posiciones 10-13 de la CVEGEO de manzana (ENT 2 + MUN 3 + LOC 4 + AGEB 4 + MZA 3)
+        u['CVE_AGEB'] = u['CVEGEO'].astype('string[pyarrow]').str.slice(9, 13)
+        
+        # Exportar (GeoParquet; GeoJSON opcional)
+        ruta_salida_u = os.path.join(OUTPUT_DIR, "sits_capa_urbana.geojson")
+        exportar_capa(texto_filtros(u), ruta_salida_u, "Urbano")
+    else:
+        r = procesar_geo(PATH_SHP_RUR, PATH_CSV_RUR, 'Rural', MUNICIPIO_OBJETIVO, FACTOR_RURAL, insumos)
+        if r is None: return
+        r['CVE_AGEB'] = 'RURAL'
+        ruta_salida_r = os.path.join(OUTPUT_DIR, "sits_capa_rural.geojson")
+        exportar_capa(texto_filtros(r), ruta_salida_r, "Rural")
+
+if __name__ == '__main__':
+    log.info(f"🚀 INICIANDO SITS - MOTOR INTEGRAL (SITS + MCR + SENDAI + ECONOMÍA + INGENIERÍA)")
+    log.info(f"----------------------------------------------------------------")
+
+    # Raster de pendiente derivado una vez antes de repartir las capas, para que los dos
+    # procesos no lo calculen y escriban a la vez; lo leen del disco con cualquier método
+    # de arranque (fork o spawn)
+    asegurar_raster_pendiente(PATH_DEM)
+
+    # DENUE y ríos se leen una sola vez para las dos capas (filtro bbox de GDAL con la caja
+    # de ambos mapas del municipio) y cada proceso los recibe ya leídos
+    try:
+        cajas = cajas_municipio((PATH_SHP_URB, PATH_SHP_RUR), MUNICIPIO_OBJETIVO)
+    except Exception as e:
+        log.warning(f"   ⚠️ No se pudo leer la extensión del municipio ({e}). DENUE y ríos se leerán por capa.")
+        cajas = None
+    insumos = None
+    if cajas is not None:
+        insumos = (leer_insumo(PATH_DENUE, cajas, BUFFER_GAS_M), leer_insumo(PATH_RIOS, cajas, BUFFER_RIO_M))
+
+    # Urbano y Rural en dos procesos (GDAL/shapely ocupan la CPU en ambos); la red
+    # hidrográfica para la web se exporta mientras tanto en el proceso principal
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        futuros = {pool.submit(generar_capa, t, insumos): t for t in ('Urbano', 'Rural')}
+        exportar_rios_web(PATH_RIOS)
+        fallidas = []
+        for f in as_completed(futuros):
+            try:
+                f.result()
+            except Exception as e:
+                log.error(f"   ❌ Error procesando la capa {futuros[f]}: {e}")
+                fallidas.append(futuros[f])
+
+    if fallidas:
+        log.error(f"\n❌ La base de datos quedó incompleta (capas con error: {', '.join(fallidas)}).")
+        sys.exit(1)
+
+    log.info("\n🏁 BASE DE DATOS GENERADA Y ACTUALIZADA CON ÉXITO.")
+    log.info(f"   Listo para ejecutar 'streamlit run app.py'")
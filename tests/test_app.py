@@ -0,0 +1,45 @@
+import os
+
+import geopandas as gpd
+import pytest
+from streamlit.testing.v1 import AppTest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def capas_mixtas(tmp_path, monkeypatch):
+    # Capas de ejemplo con el texto de los filtros en dtypes distintos por capa:
+    # CVE_AGEB Arrow en la urbana, NOM_LOC Arrow en la rural
+    os.makedirs(tmp_path / "output")
+    u = gpd.read_file(os.path.join(RAIZ, "sits_capa_urbana.geojson"))
+    r = gpd.read_file(os.path.join(RAIZ, "sits_capa_rural.geojson"))
+    u['CVE_AGEB'] = u['CVE_AGEB'].astype('string[pyarrow]')
+    r['NOM_LOC'] = r['NOM_LOC'].astype('string[pyarrow]')
+    u.to_parquet(tmp_path / "output" / "sits_capa_urbana.parquet")
+    r.to_parquet(tmp_path / "output" / "sits_capa_rural.parquet")
+    monkeypatch.chdir(tmp_path)
+
+
+def test_carga_capas_con_dtypes_mixtos(capas_mixtas):
+    at = AppTest.from_file(os.path.join(RAIZ, "app.py"), default_timeout=300).run()
+    assert not at.exception
+
+
+def widget(elementos, etiqueta):
+    return next(w for w in elementos if w.label == etiqueta)
+
+
+def test_filtro_solo_rural(capas_mixtas):
+    # Zona sin manzanas urbanas: los mapas se centran en toda la zona
+    at = AppTest.from_file(os.path.join(RAIZ, "app.py"), default_timeout=300).run()
+    widget(at.radio, "🌎 Tipo de Comunidad:").set_value("Rural").run()
+    assert not at.exception
+
+
+def test_localidad_rural(capas_mixtas):
+    at = AppTest.from_file(os.path.join(RAIZ, "app.py"), default_timeout=300).run()
+    loc = widget(at.selectbox, "📍 Localidad Específica:")
+    rural = next(o for o in loc.options if o != "TODAS" and "(Cabecera)" not in o)
+    loc.set_value(rural).run()
+    assert not at.exception
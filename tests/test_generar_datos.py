@@ -0,0 +1,66 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import rasterio
+import shapely
+from rasterio.transform import from_origin
+
+import generar_datos_final as gen
+
+
+def test_clave_geo_columnas_arrow():
+    # Mismos dtypes que deja leer_csv_censo: texto Arrow y MUN/LOC categóricas
+    df = pd.DataFrame({
+        'ENTIDAD': pd.Series(['30', '30'], dtype='string[pyarrow]'),
+        'MUN': pd.Categorical(['118', '118']),
+        'LOC': pd.Categorical(['0001', '0002']),
+        'AGEB': pd.Series(['0012', None], dtype='string[pyarrow]'),
+    })
+    clave = gen.clave_geo(df, ['ENTIDAD', 'MUN', 'LOC', 'AGEB'])
+    assert clave.tolist() == ['301180001' + '0012', '301180002']
+    assert clave.index.equals(df.index)
+
+
+def test_texto_filtros_mismo_dtype_en_ambas_capas():
+    u = pd.DataFrame({'TIPO': ['Urbano'], 'NOM_LOC': ['Catemaco (Cabecera)'],
+                      'CVE_AGEB': pd.Series(['0012'], dtype='string[pyarrow]')})
+    r = pd.DataFrame({'TIPO': ['Rural'], 'NOM_LOC': pd.Series(['Sontecomapan'], dtype='string[pyarrow]'),
+                      'CVE_AGEB': ['RURAL']})
+    u, r = gen.texto_filtros(u), gen.texto_filtros(r)
+    for c in gen.COLS_FILTRO:
+        assert u[c].dtype == r[c].dtype
+
+
+def test_pendiente_mde_geografico(tmp_path, monkeypatch):
+    # Rampa hacia el este de 1 m por celda de 1e-4° (~10.6 m a 18.4° N): ~9.5 % de pendiente
+    monkeypatch.setattr(gen, 'OUTPUT_DIR', str(tmp_path))
+    dem = np.tile(np.arange(60, dtype=np.float32), (60, 1))
+    ruta_dem = str(tmp_path / "mde_geo.tif")
+    with rasterio.open(ruta_dem, 'w', driver='GTiff', width=60, height=60, count=1, dtype='float32',
+                       crs='EPSG:4326', transform=from_origin(-95.1, 18.4, 1e-4, 1e-4)) as dst:
+        dst.write(dem, 1)
+
+    with rasterio.open(gen.asegurar_raster_pendiente(ruta_dem)) as src:
+        assert src.crs.is_projected
+        pendiente = src.read(1)
+    centro = pendiente[20:-20, 20:-20]
+    assert np.allclose(centro[centro != gen.NODATA_PENDIENTE], 9.5, atol=0.5)
+
+
+def test_ruta_cache_depende_de_parametros_y_version(monkeypatch):
+    base = gpd.GeoDataFrame(geometry=[shapely.box(0, 0, 1, 1)], crs='EPSG:4326')
+    ruta = gen.ruta_cache("restricciones", base, None, parametros=(100, 20))
+    assert gen.ruta_cache("restricciones", base, None, parametros=(100, 20)) == ruta
+    assert gen.ruta_cache("restricciones", base, None, parametros=(50, 20)) != ruta
+    monkeypatch.setattr(gen, 'VERSION_CALCULO', gen.VERSION_CALCULO + 1)
+    assert gen.ruta_cache("restricciones", base, None, parametros=(100, 20)) != ruta
+
+
+def test_cajas_municipio_solo_el_municipio(tmp_path):
+    mapa = gpd.GeoDataFrame({'CVE_MUN': ['032', '118', '118']},
+                            geometry=[shapely.box(5, 5, 6, 6), shapely.box(0, 0, 1, 1), shapely.box(2, 1, 3, 2)],
+                            crs='EPSG:4326')
+    ruta = str(tmp_path / "mapa.shp")
+    mapa.to_file(ruta)
+    cajas = gen.cajas_municipio((ruta, None), '118')
+    assert list(cajas.total_bounds) == [0, 0, 3, 2]